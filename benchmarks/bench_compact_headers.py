@@ -0,0 +1,129 @@
+"""
+Compares the serialized size and serialization time of HAR entry events with
+headers emitted as HAR name/value lists and as compact name -> value maps.
+
+Uses generated browser-like entries, or the entries of real HAR files:
+
+    python benchmarks/bench_compact_headers.py --entries 5000
+    python benchmarks/bench_compact_headers.py --har run1.har run2.har
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "package", "bin"))
+
+from har_normalizer import HarNormalizer, ThousandEyesAdapter
+
+REQUEST_HEADERS = [
+    ("Host", "www.example.com"),
+    ("User-Agent", "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/125.0"),
+    ("Accept", "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"),
+    ("Accept-Language", "en-US,en;q=0.9"),
+    ("Accept-Encoding", "gzip, deflate, br"),
+    ("Connection", "keep-alive"),
+    ("Referer", "https://www.example.com/"),
+    ("Cookie", "session=abc123; theme=dark"),
+    ("Sec-Fetch-Dest", "script"),
+    ("Sec-Fetch-Mode", "no-cors"),
+    ("Sec-Fetch-Site", "same-site"),
+    ("Cache-Control", "no-cache"),
+]
+RESPONSE_HEADERS = [
+    ("Content-Type", "application/javascript; charset=utf-8"),
+    ("Content-Length", "48213"),
+    ("Cache-Control", "public, max-age=31536000, immutable"),
+    ("Date", "Sat, 01 Jun 2024 10:00:00 GMT"),
+    ("ETag", '"5f1c-6b2a9e3d"'),
+    ("Last-Modified", "Fri, 31 May 2024 22:14:09 GMT"),
+    ("Server", "nginx"),
+    ("Strict-Transport-Security", "max-age=63072000; includeSubDomains"),
+    ("Vary", "Accept-Encoding"),
+    ("Vary", "Origin"),
+    ("X-Cache", "HIT"),
+    ("Set-Cookie", "a=1; Path=/; Secure"),
+    ("Set-Cookie", "b=2; Path=/; Secure"),
+    ("Access-Control-Allow-Origin", "*"),
+]
+
+
+def make_entries(count):
+    def headers(pairs):
+        return [{"name": name, "value": value} for name, value in pairs]
+
+    return [
+        {
+            "startedDateTime": f"2024-06-01T10:00:{i % 60:02d}.{i % 1000:03d}Z",
+            "request": {
+                "method": "GET",
+                "url": f"https://cdn.example.com/assets/{i}.js",
+                "httpVersion": "HTTP/2",
+                "headers": headers(random.sample(REQUEST_HEADERS, 9)),
+                "queryString": [],
+                "cookies": [],
+                "headersSize": -1,
+                "bodySize": 0,
+            },
+            "response": {
+                "status": 200,
+                "statusText": "OK",
+                "httpVersion": "HTTP/2",
+                "headers": headers(RESPONSE_HEADERS),
+                "cookies": [],
+                "content": {"size": 48213, "mimeType": "application/javascript"},
+                "redirectURL": "",
+                "headersSize": -1,
+                "bodySize": 12840,
+            },
+            "cache": {},
+            "timings": {"dns": 1, "connect": 2, "ssl": 3, "wait": 30, "receive": 4},
+            "time": 40,
+        }
+        for i in range(count)
+    ]
+
+
+def load_entries(paths):
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as fp:
+            entries.extend(json.load(fp)["log"]["entries"])
+    return entries
+
+
+def serialize(entries, compact):
+    normalizer = HarNormalizer(
+        ThousandEyesAdapter(1, "bench", "bench-agent", 1717236000, "https://app"),
+        compact=compact,
+    )
+    started = time.perf_counter()
+    size = 0
+    for entry in normalizer.entries(entries):
+        size += len(json.dumps(entry.to_dict(), ensure_ascii=False).encode("utf-8"))
+    return size, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--har", nargs="*", help="HAR files to use instead")
+    args = parser.parse_args()
+
+    entries = load_entries(args.har) if args.har else make_entries(args.entries)
+    list_size, list_time = serialize(copy.deepcopy(entries), compact=False)
+    compact_size, compact_time = serialize(copy.deepcopy(entries), compact=True)
+
+    print(f"entries={len(entries)}")
+    print(f"header lists   {list_size / len(entries):>9,.0f} bytes/event  {list_time:.3f}s")
+    print(
+        f"compact maps   {compact_size / len(entries):>9,.0f} bytes/event  {compact_time:.3f}s"
+    )
+    print(f"size reduction {1 - compact_size / list_size:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
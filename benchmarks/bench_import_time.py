@@ -0,0 +1,82 @@
+"""
+Measures the cold start of the modular input scripts with `python -X importtime`
+and fails when an invocation exceeds its import budget.
+
+Each script is started the way splunkd starts it for --scheme, which must not pull
+in solnlib, requests or the API clients. The import time of those heavy modules is
+reported alongside for reference.
+
+    python benchmarks/bench_import_time.py --budget-ms 150
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "package", "bin")
+SCRIPTS = ("synthetics_browser_har_input.py", "cte_web_transactions_har_input.py")
+# Modules that only stream_events should need
+DEFERRED = (
+    "solnlib",
+    "requests",
+    "synthetics_browser_tests",
+    "cte_web_transactions",
+    "har_utils",
+)
+
+
+def import_profile(argv):
+    """
+    Runs argv under -X importtime and returns (names of all imported modules, total us
+    spent importing top-level modules)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        cwd=BIN,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    modules = set()
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules.add(name.strip())
+        # Nested imports are indented below their parent
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return modules, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    over_budget = False
+    for script in SCRIPTS:
+        totals = []
+        for _ in range(args.repeat):
+            modules, total = import_profile([script, "--scheme"])
+            totals.append(total)
+        median_ms = statistics.median(totals) / 1000
+        eager = [name for name in DEFERRED if any(m.startswith(name) for m in modules)]
+        status = "ok" if median_ms <= args.budget_ms and not eager else "OVER BUDGET"
+        over_budget = over_budget or status != "ok"
+        print(f"{script:<38} --scheme {median_ms:>8.1f} ms  {status}")
+        if eager:
+            print(f"    imported eagerly: {', '.join(eager)}")
+
+    for name in DEFERRED[:2]:
+        _, total = import_profile(["-c", f"import import_declare_test, {name}"])
+        print(f"{'(reference) import ' + name:<38}          {total / 1000:>8.1f} ms")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
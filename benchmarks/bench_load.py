@@ -0,0 +1,171 @@
+"""
+End-to-end load test of the polling runs against the local mock API (mock_api.py).
+
+Starts the mock server, then drives --runs polling runs of run_poll (Synthetics)
+and get_web_transactions (ThousandEyes) through a CheckpointCache over an
+in-memory KV store, with events written to a fake EventWriter. The mock API clock
+moves --advance seconds between runs, so later runs find the new runs and rounds
+the way consecutive polls would. State files live in a temporary directory and
+carry over from run to run.
+
+For every run it reports wall time, events/sec, API calls in total, per test and
+per endpoint, 429s served, KV store calls and the run's own metrics summary:
+
+    python benchmarks/bench_load.py --tests 20 --entries 500 --latency 0.05
+    python benchmarks/bench_load.py --platform thousandeyes --throttle-rate 0.1
+    python benchmarks/bench_load.py --single-instance --test-workers 16
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from xml.sax.saxutils import unescape
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "package", "bin"))
+
+import mock_api
+from fakes import FakeEventWriter, FakeKVStoreCheckpointer, use_state_dir
+from run_metrics import METRICS_SOURCETYPE
+
+
+def platform_config(platform_name: str, url: str, args) -> dict:
+    common = {
+        "account": f"bench_{platform_name}",
+        "access_token": "bench",
+        "index": "main",
+        "input_name": f"{platform_name}_load://bench",
+        "requests_per_minute": args.requests_per_minute,
+    }
+    if platform_name == "synthetics":
+        return {
+            **common,
+            "o11y_url": url,
+            "org_id": "bench",
+            "realm": "us1",
+            "select_tests": "",
+            "test_workers": args.test_workers,
+            "sourcetype": "splunk:synthetics:har",
+            "platform": "Splunk Synthetics",
+        }
+    return {
+        **common,
+        "api_endpoint": f"{url}/v7",
+        "page_workers": args.page_workers,
+        "sourcetype": "cisco:thousandeyes:har",
+        "platform": "Cisco Thousand Eyes",
+    }
+
+
+def run_summary(writer) -> dict:
+    """
+    The RunMetrics summary event the run wrote, decoded
+    """
+    for chunk in writer._out.captured:
+        start = chunk.index("<data>") + len("<data>")
+        return json.loads(unescape(chunk[start : chunk.index("</data>", start)]))
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--platform", choices=("synthetics", "thousandeyes", "both"), default="both"
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument(
+        "--advance", type=float, default=300, help="API clock seconds between runs"
+    )
+    parser.add_argument(
+        "--single-instance",
+        action="store_true",
+        help="share HTTP sessions across runs, as single-instance mode does",
+    )
+    parser.add_argument("--test-workers", type=int, default=8)
+    parser.add_argument("--page-workers", type=int, default=4)
+    parser.add_argument("--requests-per-minute", type=float, default=60000)
+    parser.add_argument("--kv-latency", type=float, default=0.005)
+    parser.add_argument("--verbose", action="store_true")
+    mock_api.add_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.ERROR,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    logger = logging.getLogger("bench_load")
+
+    state_dir = tempfile.mkdtemp(prefix="haringester_load_")
+    use_state_dir(state_dir)
+    # Imported after the state dir is set up, as the clients' helpers are
+    from cte_web_transactions import get_web_transactions
+    from checkpoint_cache import CheckpointCache
+    from har_utils import SessionPool
+    from synthetics_browser_tests import run_poll
+
+    api = mock_api.MockAPI(**mock_api.options(args))
+    # Runs end at the current time, so the clients' own clock agrees with the API's
+    api.advance(-args.advance * (args.runs - 1))
+    server = mock_api.MockAPIServer(api).start()
+    platforms = ("synthetics", "thousandeyes") if args.platform == "both" else (args.platform,)
+    polls = {"synthetics": run_poll, "thousandeyes": get_web_transactions}
+    kv_stores = {name: FakeKVStoreCheckpointer(args.kv_latency) for name in platforms}
+    sessions = SessionPool() if args.single_instance else None
+    print(
+        f"mock API {server.url}: tests={args.tests} locations={args.locations} "
+        f"entries={args.entries} pages={args.pages} latency={args.latency}s "
+        f"throttle_rate={args.throttle_rate} state={state_dir}"
+    )
+
+    try:
+        for run in range(1, args.runs + 1):
+            if run > 1:
+                api.advance(args.advance)
+            for platform_name in platforms:
+                config = platform_config(platform_name, server.url, args)
+                kv_store = kv_stores[platform_name]
+                kv_store.calls.clear()
+                api.take_stats()
+                writer = FakeEventWriter(capture=METRICS_SOURCETYPE)
+
+                started = time.perf_counter()
+                checkpointer = CheckpointCache(kv_store, config["input_name"], logger)
+                try:
+                    polls[platform_name](checkpointer, config, logger, writer, sessions)
+                finally:
+                    checkpointer.flush()
+                seconds = time.perf_counter() - started
+
+                stats = api.take_stats()
+                summary = run_summary(writer)
+                events = writer._out.events - len(writer._out.captured)
+                calls = sum(stats["calls"].values())
+                tests = len(stats["test_calls"]) or 1
+                print(
+                    f"\n{platform_name} run {run}: {seconds:.2f}s events={events} "
+                    f"events/s={events / seconds:,.0f} api_calls={calls} "
+                    f"calls/test={calls / tests:.1f} 429s={stats['throttled']} "
+                    f"MB_in={stats['bytes_sent'] / 1e6:.1f} "
+                    f"kv_calls={sum(kv_store.calls.values())}"
+                )
+                print(f"  by endpoint: {json.dumps(stats['calls'], sort_keys=True)}")
+                if summary:
+                    phases = {
+                        name: phase["seconds"] for name, phase in summary["phases"].items()
+                    }
+                    print(
+                        f"  run metrics: status={summary['status']} "
+                        f"http_calls={summary.get('http_calls', 0)} "
+                        f"http_retries={summary.get('http_retries', 0)} "
+                        f"phase_seconds={json.dumps(phases)}"
+                    )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
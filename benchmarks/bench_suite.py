@@ -0,0 +1,272 @@
+"""
+Offline benchmark suite for the ingestion hot paths, on synthetic HAR data.
+
+For every size, a Splunk Synthetics HAR artifact and a ThousandEyes round are
+generated (see synthetic_har.py) and each case measures, separately:
+
+    parse      reading entries: streaming the HAR file, or decoding result pages
+    normalize  HarNormalizer entries rendered into event dicts
+    serialize  json.dumps of the event dicts
+    end_to_end SplunkSynthetics.parse_har / ThousandEyes.get_har into write_events
+               and a fake EventWriter, plus its peak traced memory
+
+Throughputs are the median of --repeat runs. Results can be saved as a baseline,
+and later runs compared against it, failing when a throughput drops or the peak
+memory grows by more than --tolerance:
+
+    python benchmarks/bench_suite.py --sizes 1000,10000 --save-baseline baseline.json
+    python benchmarks/bench_suite.py --sizes 1000,10000 --compare baseline.json
+
+Baselines are machine specific, so only compare runs made on the same machine.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "package", "bin"))
+
+from cte_web_transactions import ThousandEyes
+from fakes import FakeEventWriter, FakeResponse
+from har_normalizer import HarNormalizer, SyntheticsAdapter
+from har_stream import iter_log_items
+from har_utils import write_events
+from synthetic_har import START_MS, te_round_pages, write_synthetics_har
+from synthetics_browser_tests import SplunkSynthetics
+
+SYNTHETICS_CONFIG = {
+    "access_token": "bench",
+    "o11y_url": "https://api.us1.signalfx.com",
+    "org_id": "bench",
+    "realm": "us1",
+    "select_tests": "",
+    "sourcetype": "splunk:synthetics:har",
+    "index": "main",
+    "input_name": "synthetics_browser_har_input://bench",
+    "platform": "Splunk Synthetics",
+}
+TE_CONFIG = {
+    "access_token": "bench",
+    "api_endpoint": "https://api.thousandeyes.com/v7",
+    "sourcetype": "cisco:thousandeyes:har",
+    "index": "main",
+    "input_name": "cte_web_transactions_har_input://bench",
+    "platform": "Cisco Thousand Eyes",
+}
+HAR_URL = ["/v2/synthetics/artifacts/bench.har", "aws-us-east-1", START_MS]
+
+# Metrics where a lower value is the regression; everything else regresses upwards
+THROUGHPUTS = (
+    "parse_entries_per_s",
+    "normalize_entries_per_s",
+    "serialize_entries_per_s",
+    "events_per_s",
+    "mb_per_s",
+)
+
+
+def timed(func, repeat, setup=None):
+    """
+    Returns (median seconds, last result) of calling func repeat times. With setup,
+    func is called with a fresh, untimed setup() result each time.
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        started = time.perf_counter()
+        result = func(*args)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations), result
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def results(entries, seconds, end_to_end, writer, peak):
+    return {
+        "entries": entries,
+        "parse_entries_per_s": round(entries / seconds["parse"]),
+        "normalize_entries_per_s": round(entries / seconds["normalize"]),
+        "serialize_entries_per_s": round(entries / seconds["serialize"]),
+        "events_per_s": round(end_to_end[1] / end_to_end[0]),
+        "mb_per_s": round(writer._out.chars / end_to_end[0] / 1e6, 2),
+        "peak_mb": round(peak / 1e6, 2),
+    }
+
+
+def bench_synthetics(size, args, logger):
+    client = SplunkSynthetics(SYNTHETICS_CONFIG, logger)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.har")
+        with open(path, "wb") as fp:
+            write_synthetics_har(fp, size, args.pages, args.transactions, args.seed)
+
+        def parse():
+            with open(path, "rb") as fp:
+                sections = list(iter_log_items(fp, ("pages", "_groupData")))
+                fp.seek(0)
+                return sections, [item for _, item in iter_log_items(fp, ("entries",))]
+
+        def normalize(parsed):
+            sections, items = parsed
+            normalizer = HarNormalizer(
+                SyntheticsAdapter(1, "bench", *HAR_URL[1:], "bench", "us1", "https://app")
+            )
+            for section, item in sections:
+                if section == "pages":
+                    normalizer.add_page(item, START_MS)
+                else:
+                    normalizer.add_business_transaction(item)
+            return [normalizer.normalize(item).to_dict() for item in items]
+
+        def end_to_end(writer):
+            data = client.parse_har(open(path, "rb"), 1, "bench", HAR_URL)
+            return write_events(data, SYNTHETICS_CONFIG, logger, writer)
+
+        return measure(size, parse, normalize, end_to_end, args)
+
+
+def bench_thousandeyes(size, args, logger):
+    pages = te_round_pages(size, args.pages, args.transactions, args.seed)
+    client = ThousandEyes(TE_CONFIG, logger)
+    round_page = {"agentId": 1, "roundId": START_MS // 1000, "pageNum": len(pages)}
+
+    class Session:
+        def get(self, url, params=None, **kwargs):
+            return FakeResponse(pages[int(url.rsplit("/", 1)[1])])
+
+    def parse():
+        return [json.loads(page) for page in pages]
+
+    def normalize(parsed):
+        return [
+            entry.to_dict()
+            for data in parsed
+            for entry in client._page_entries(1, round_page["roundId"], data)
+        ]
+
+    def end_to_end(writer):
+        data = client.get_har(Session(), 1, round_page)
+        return write_events(data, TE_CONFIG, logger, writer)
+
+    return measure(size, parse, normalize, end_to_end, args)
+
+
+def measure(size, parse, normalize, end_to_end, args):
+    seconds = {}
+    seconds["parse"], _ = timed(parse, args.repeat)
+    # Normalizing modifies the parsed entries, so every run gets freshly parsed ones
+    seconds["normalize"], events = timed(normalize, args.repeat, setup=parse)
+    seconds["serialize"], _ = timed(
+        lambda: [json.dumps(e, ensure_ascii=False, default=str) for e in events],
+        args.repeat,
+    )
+    del events
+
+    writer = FakeEventWriter()
+    end_to_end_seconds, count = timed(lambda: end_to_end(writer), args.repeat)
+    writer._out.chars //= args.repeat
+    peak = peak_memory(lambda: end_to_end(FakeEventWriter()))
+    return results(size, seconds, (end_to_end_seconds, count), writer, peak)
+
+
+def compare(current, baseline, tolerance):
+    """
+    Prints the change of every metric against the baseline and returns the
+    regressions beyond tolerance
+    """
+    regressions = []
+    for case, metrics in current.items():
+        if case not in baseline:
+            print(f"{case}: not in baseline")
+            continue
+        for name, value in metrics.items():
+            before = baseline[case].get(name)
+            if name == "entries" or not before:
+                continue
+            change = value / before - 1
+            worse = -change if name in THROUGHPUTS else change
+            flag = "REGRESSION" if worse > tolerance else ""
+            print(f"{case:<22} {name:<24} {before:>12} -> {value:>12} {change:>+8.1%} {flag}")
+            if flag:
+                regressions.append(f"{case} {name}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", default="1000,10000", help="comma separated entries per HAR/round"
+    )
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--transactions", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    logger = logging.getLogger("bench")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    current = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        for platform_name, bench in (
+            ("synthetics", bench_synthetics),
+            ("thousandeyes", bench_thousandeyes),
+        ):
+            case = f"{platform_name}/{size}"
+            current[case] = bench(size, args, logger)
+            print(f"{case:<22} {json.dumps(current[case])}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as fp:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.platform(),
+                    "args": {
+                        "pages": args.pages,
+                        "transactions": args.transactions,
+                        "repeat": args.repeat,
+                        "seed": args.seed,
+                    },
+                    "results": current,
+                },
+                fp,
+                indent=2,
+            )
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            baseline = json.load(fp)
+        if baseline.get("args", {}).get("pages") != args.pages or baseline.get(
+            "args", {}
+        ).get("transactions") != args.transactions:
+            print("Warning: baseline was generated with different --pages/--transactions")
+        regressions = compare(current, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compares serial and concurrent page fetching in ThousandEyes.get_har.
+
+A fake session answers every page request after a fixed delay, so the
+numbers reflect how much network wait the page workers overlap.
+
+    python benchmarks/bench_te_get_har.py --pages 9 --latency 0.2 --workers 4
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "package", "bin"))
+
+from cte_web_transactions import ThousandEyes
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+        self.content = json.dumps(payload).encode("utf-8")
+        self.status_code = 200
+        self.headers = {}
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    def __init__(self, latency, entries):
+        self.latency = latency
+        self.entries = entries
+
+    def get(self, url, params=None, **kwargs):
+        time.sleep(self.latency)
+        entries = [
+            {
+                "startedDateTime": "2024-06-01T10:00:00.123Z",
+                "request": {"url": f"{url}/resource/{i}", "postData": {"text": "x"}},
+                "response": {"status": 200},
+            }
+            for i in range(self.entries)
+        ]
+        return FakeResponse(
+            {
+                "test": {"testName": "bench"},
+                "results": [
+                    {
+                        "_links": {"appLink": {"href": "https://app.thousandeyes.com"}},
+                        "agent": {"agentName": "bench-agent"},
+                        "har": {"log": {"entries": entries}},
+                    }
+                ],
+            }
+        )
+
+
+def run(workers, args):
+    client = ThousandEyes(
+        {
+            "access_token": "bench",
+            "api_endpoint": "https://api.thousandeyes.com/v7",
+            "page_workers": workers,
+        },
+        logging.getLogger("bench"),
+    )
+    session = FakeSession(args.latency, args.entries)
+    page = {"agentId": 1, "roundId": 1717236000, "pageNum": args.pages}
+    started = time.perf_counter()
+    events = list(client.get_har(session, 1, page))
+    return time.perf_counter() - started, len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=9)
+    parser.add_argument("--entries", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    serial, serial_events = run(1, args)
+    concurrent, concurrent_events = run(args.workers, args)
+    assert serial_events == concurrent_events
+
+    print(f"pages={args.pages} latency={args.latency}s events={serial_events}")
+    print(f"serial       {serial:.3f}s")
+    print(f"workers={args.workers:<3} {concurrent:.3f}s")
+    print(f"speedup      {serial / concurrent:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compares the strptime conversion previously used for HAR entry timestamps with
+har_time.iso_to_epoch.
+
+    python benchmarks/bench_timestamps.py --entries 100000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "package", "bin"))
+
+from har_time import iso_to_epoch
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def strptime_to_epoch(value):
+    return int(
+        (datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ") - EPOCH).total_seconds()
+    )
+
+
+def make_timestamps(count, minutes):
+    """
+    Timestamps of one synthetic run: entries spread over a few minutes, as in a HAR file
+    """
+    stamps = []
+    for _ in range(count):
+        minute = random.randrange(minutes)
+        stamps.append(
+            f"2024-06-01T10:{minute:02d}:{random.randrange(60):02d}.{random.randrange(1000):03d}Z"
+        )
+    return stamps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--minutes", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    stamps = make_timestamps(args.entries, args.minutes)
+    for value in stamps[:1000]:
+        assert iso_to_epoch(value) == strptime_to_epoch(value), value
+
+    candidates = [
+        ("strptime", strptime_to_epoch),
+        ("iso_to_epoch", iso_to_epoch),
+        ("iso_to_epoch(millis)", lambda v: iso_to_epoch(v, millis=True)),
+    ]
+    results = {}
+    for name, func in candidates:
+        best = min(
+            timeit.repeat(
+                lambda: [func(v) for v in stamps], number=1, repeat=args.repeat
+            )
+        )
+        results[name] = best
+        print(f"{name:<22} {args.entries / best:>12,.0f} timestamps/s")
+    print(f"speedup                {results['strptime'] / results['iso_to_epoch']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Measures events/sec of har_utils.write_events, which batches events into buffered
+<stream> chunks, against the previous path of one smi.Event written per HAR entry.
+Both paths are checked to produce identical XML.
+
+    python benchmarks/bench_write_events.py --events 50000
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "package", "bin"))
+
+from splunklib import modularinput as smi
+
+from har_utils import write_events
+
+CONFIG = {
+    "sourcetype": "splunk:synthetics:har",
+    "index": "main",
+    "input_name": "synthetics_browser_har_input://bench",
+    "platform": "Splunk Synthetics",
+}
+
+
+def make_events(count):
+    return [
+        {
+            "page_url": "https://example.com/",
+            "request": {
+                "method": "GET",
+                "url": f"https://cdn.example.com/assets/{i}.js?a=1&b=<2>",
+                "headers": [{"name": "Accept", "value": "*/*"}] * 8,
+            },
+            "response": {"status": 200, "content": {"size": 1234, "mimeType": "text/javascript"}},
+            "startedDateTime": 1717236000 + i / 1000,
+            "timings": {"dns": 1, "connect": 2, "wait": 30, "receive": 4},
+        }
+        for i in range(count)
+    ]
+
+
+def per_event(data, config, event_writer):
+    for line in data:
+        event_writer.write_event(
+            smi.Event(
+                data=json.dumps(line, ensure_ascii=False, default=str),
+                index=config["index"],
+                source=config["platform"],
+                sourcetype=config["sourcetype"],
+                time=line.get("startedDateTime"),
+                stanza=config["input_name"],
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=50000)
+    args = parser.parse_args()
+    logger = logging.getLogger("bench")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    data = make_events(args.events)
+
+    before_out = io.StringIO()
+    started = time.perf_counter()
+    per_event(data, CONFIG, smi.EventWriter(output=before_out))
+    before = time.perf_counter() - started
+
+    after_out = io.StringIO()
+    started = time.perf_counter()
+    write_events(iter(data), CONFIG, logger, smi.EventWriter(output=after_out))
+    after = time.perf_counter() - started
+
+    assert before_out.getvalue() == after_out.getvalue(), "XML output differs"
+
+    print(f"events={args.events}")
+    print(f"smi.Event per entry {args.events / before:>12,.0f} events/s")
+    print(f"batched write_events {args.events / after:>11,.0f} events/s")
+    print(f"speedup              {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
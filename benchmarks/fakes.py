@@ -0,0 +1,139 @@
+"""
+Stand-ins for the Splunk and HTTP objects the ingestion code writes to and reads
+from, so the hot paths can be measured offline
+"""
+import io
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+import har_utils
+
+
+def use_state_dir(path: str) -> None:
+    """
+    Keeps the add-on's local state files (inventories, retry queues, rate limits,
+    checkpoint journals) under path instead of $SPLUNK_HOME, which needs Splunk
+    """
+    har_utils.make_splunkhome_path = lambda parts: os.path.join(path, *parts)
+
+
+class CountingSink(io.TextIOBase):
+    """
+    Text stream that keeps no data, only the characters, events and flushes written
+    to it. Writes containing capture, such as a sourcetype, are kept in captured.
+    """
+
+    def __init__(self, capture: str = None) -> None:
+        self.chars = 0
+        self.events = 0
+        self.flushes = 0
+        self.capture = capture
+        self.captured = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.chars += len(text)
+        self.events += text.count("<event ")
+        if self.capture and self.capture in text:
+            self.captured.append(text)
+        return len(text)
+
+    def flush(self) -> None:
+        self.flushes += 1
+
+
+class FakeEventWriter:
+    """
+    The parts of splunklib's EventWriter that har_utils.EventBatcher writes through
+    """
+
+    def __init__(self, capture: str = None) -> None:
+        self._out = CountingSink(capture)
+        self.header_written = False
+
+
+class FakeResponse:
+    """
+    Successful response holding a JSON body, decoded on every json() call as
+    requests does
+    """
+
+    status_code = 200
+
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+        self.headers = {"Content-Type": "application/json"}
+
+    @classmethod
+    def of(cls, payload) -> "FakeResponse":
+        return cls(json.dumps(payload).encode("utf-8"))
+
+    def raise_for_status(self) -> None:
+        return None
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = 1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+    def close(self) -> None:
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+class FakeKVStoreCheckpointer:
+    """
+    In-memory stand-in for solnlib's KVStoreCheckpointer, including the collection
+    CheckpointCache bulk-loads from. Every call can be delayed by latency seconds,
+    like a REST round trip to splunkd, and is counted in calls.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.states = {}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._collection_data = self
+
+    def _call(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get(self, key: str):
+        self._call("get")
+        state = self.states.get(key)
+        return None if state is None else json.loads(state)
+
+    def update(self, key: str, state) -> None:
+        self._call("update")
+        self.states[key] = json.dumps(state)
+
+    def batch_update(self, states: list) -> None:
+        self._call("batch_update")
+        for record in states:
+            self.states[record["_key"]] = json.dumps(record["state"])
+
+    def delete(self, key: str) -> None:
+        self._call("delete")
+        self.states.pop(key, None)
+
+    def query(self, skip: int = 0, limit: int = 0, **kwargs) -> list:
+        self._call("query")
+        records = [
+            {"_key": key, "state": state} for key, state in sorted(self.states.items())
+        ]
+        return records[skip : skip + limit] if limit else records[skip:]
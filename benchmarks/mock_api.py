@@ -0,0 +1,453 @@
+"""
+Local stand-in for the Splunk Observability Synthetics and ThousandEyes APIs, for
+end-to-end load tests of run_poll and get_web_transactions without network access.
+
+Serves the endpoints the clients call:
+
+    /v2/synthetics/tests                              paginated Browser test list
+    /v2/synthetics/tests/{id}/runs                    runs of a location from startTime to endTime
+    /v2/synthetics/tests/{id}/artifacts               artifacts of a run
+    /v2/synthetics/tests/{id}/artifacts/har           the HAR artifact
+    /v7/tests/web-transactions                        web transaction test list
+    /v7/test-results/{id}/web-transactions            latest rounds, or rounds in a window
+    /v7/test-results/{id}/web-transactions/agent/{agent}/round/{round}[/page/{n}]
+
+Tests run every --frequency minutes (Synthetics, at each location in turn a few
+seconds apart) or every --interval seconds (ThousandEyes, on every agent). The
+API clock can be moved with MockAPI.advance, so successive polls find new runs.
+Latency, pagination, the share of requests throttled with 429 and payload sizes
+are configurable. Every request is counted by endpoint and by test. MockAPI.fail
+makes the paths matching a pattern answer with an error status until cleared, and
+runs listed in MockAPI.without_har have no HAR artifact.
+
+    python benchmarks/mock_api.py --port 8089 --tests 50 --latency 0.05
+"""
+import argparse
+import calendar
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_har import te_round_pages, write_synthetics_har
+
+DEFAULTS = {
+    "tests": 10,
+    "locations": 2,
+    "frequency": 5,
+    "interval": 300,
+    "tests_per_page": 5,
+    "entries": 200,
+    "pages": 3,
+    "transactions": 2,
+    "latency": 0.02,
+    "jitter": 0.0,
+    "throttle_rate": 0.0,
+    "retry_after": 0,
+    "seed": 0,
+}
+# Runs listed per answer: like the real endpoint, the runs endpoint caps its answer
+# to the newest MAX_RUNS_LISTED runs of the requested range
+MAX_RUNS_LISTED = 100
+
+SYNTHETICS_TEST = re.compile(r"^/v2/synthetics/tests/(\d+)(/runs|/artifacts|/artifacts/har)$")
+TE_RESULTS = re.compile(
+    r"^/v7/test-results/(\d+)/web-transactions"
+    r"(?:/agent/(\d+)/round/(\d+)(?:/page/(\d+))?)?$"
+)
+
+
+def _iso(epoch_ms: int) -> str:
+    seconds, millis = divmod(int(epoch_ms), 1000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{millis:03d}Z"
+
+
+def _epoch(value: str) -> float:
+    value, _, fraction = value.rstrip("Z").partition(".")
+    seconds = calendar.timegm(time.strptime(value, "%Y-%m-%dT%H:%M:%S"))
+    return seconds + float(f"0.{fraction or 0}")
+
+
+class MockAPI:
+    """
+    State behind the mock server: options, API clock, generated payloads and
+    request counts
+    """
+
+    def __init__(self, **options) -> None:
+        self.options = {**DEFAULTS, **options}
+        self.offset = 0.0
+        self._random = random.Random(self.options["seed"])
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.test_calls = Counter()
+        self.throttled = 0
+        self.bytes_sent = 0
+        # Compiled path pattern -> error status served instead of the response
+        self.failures = {}
+        # (test id, location, run epoch ms) of the runs whose artifacts have no HAR
+        self.without_har = set()
+        # One HAR and one round are generated and served for every run
+        har = BytesIO()
+        write_synthetics_har(
+            har,
+            self.options["entries"],
+            self.options["pages"],
+            self.options["transactions"],
+            self.options["seed"],
+        )
+        self.har = har.getvalue()
+        self.round_pages = te_round_pages(
+            self.options["entries"],
+            self.options["pages"],
+            self.options["transactions"],
+            self.options["seed"],
+        )
+
+    def now(self) -> float:
+        return time.time() + self.offset
+
+    def advance(self, seconds: float) -> None:
+        self.offset += seconds
+
+    def fail(self, pattern: str, status: int = 404) -> None:
+        """
+        Answers every request whose path matches the regular expression pattern with
+        status, until removed from failures
+        """
+        self.failures[re.compile(pattern)] = status
+
+    def failure(self, path: str):
+        for pattern, status in list(self.failures.items()):
+            if pattern.search(path):
+                return status
+        return None
+
+    def take_stats(self) -> dict:
+        """
+        Returns and resets the request counts
+        """
+        with self._lock:
+            stats = {
+                "calls": dict(self.calls),
+                "test_calls": dict(self.test_calls),
+                "throttled": self.throttled,
+                "bytes_sent": self.bytes_sent,
+            }
+            self.calls.clear()
+            self.test_calls.clear()
+            self.throttled = 0
+            self.bytes_sent = 0
+        return stats
+
+    def count(self, endpoint: str, test_id=None, sent: int = 0) -> None:
+        with self._lock:
+            self.calls[endpoint] += 1
+            if test_id is not None:
+                self.test_calls[test_id] += 1
+            self.bytes_sent += sent
+
+    def throttle(self) -> bool:
+        with self._lock:
+            throttled = self._random.random() < self.options["throttle_rate"]
+            self.throttled += throttled
+        return throttled
+
+    def delay(self) -> float:
+        latency = self.options["latency"]
+        jitter = self.options["jitter"]
+        return max(0.0, latency + (self._random.uniform(-jitter, jitter) if jitter else 0))
+
+    # Splunk Synthetics
+
+    def location_ids(self) -> list:
+        return [f"aws-region-{i}" for i in range(self.options["locations"])]
+
+    def synthetics_runs(
+        self, test_id: int, location: str, since_ms: float, until_ms: float = None
+    ) -> list:
+        """
+        Epoch ms of the newest MAX_RUNS_LISTED runs of a test at a location after
+        since_ms and up to until_ms (or now), oldest first
+        """
+        period = self.options["frequency"] * 60
+        stagger = self.location_ids().index(location) * 5 + test_id % period
+        now = self.now()
+        if until_ms is not None:
+            now = min(now, until_ms / 1000)
+        latest = int((now - stagger) // period) * period + stagger
+        runs = []
+        run = latest
+        while run * 1000 > since_ms and len(runs) < MAX_RUNS_LISTED:
+            runs.append(int(run * 1000))
+            run -= period
+        return runs[::-1]
+
+    def synthetics_test(self, test_id: int) -> dict:
+        since = (self.now() - self.options["frequency"] * 60) * 1000
+        latest = max(
+            (self.synthetics_runs(test_id, location, since)[-1], location)
+            for location in self.location_ids()
+        )
+        return {
+            "id": test_id,
+            "name": f"Browser test {test_id}",
+            "type": "browser",
+            "active": True,
+            "frequency": self.options["frequency"],
+            "locationIds": self.location_ids(),
+            "lastRunAt": _iso(latest[0]),
+            "lastRunLocationId": latest[1],
+        }
+
+    def synthetics_tests(self, page: int) -> dict:
+        per_page = self.options["tests_per_page"]
+        ids = range(1, self.options["tests"] + 1)
+        start = (page - 1) * per_page
+        tests = [self.synthetics_test(test_id) for test_id in ids[start : start + per_page]]
+        return {
+            "tests": tests,
+            "nextPageLink": page + 1 if start + per_page < len(ids) else None,
+        }
+
+    # ThousandEyes
+
+    def te_rounds(self, test_id: int, since: float, until: float) -> list:
+        """
+        Round ids (epoch seconds) of a test in (since, until], oldest first
+        """
+        interval = self.options["interval"]
+        phase = test_id % interval
+        latest = int((until - phase) // interval) * interval + phase
+        rounds = []
+        while latest > since and len(rounds) < MAX_RUNS_LISTED:
+            rounds.append(latest)
+            latest -= interval
+        return rounds[::-1]
+
+    def te_results(self, test_id: int, query: dict) -> dict:
+        now = self.now()
+        if "startDate" in query:
+            since = _epoch(query["startDate"][0]) - 1
+            until = min(now, _epoch(query.get("endDate", [_iso(now * 1000)])[0]))
+            rounds = self.te_rounds(test_id, since, until)
+        else:
+            rounds = self.te_rounds(test_id, now - self.options["interval"], now)
+        return {
+            "results": [
+                {
+                    "agent": {"agentId": agent, "agentName": f"Agent {agent}"},
+                    "roundId": round_id,
+                    "testId": test_id,
+                }
+                for round_id in rounds
+                for agent in range(1, self.options["locations"] + 1)
+            ]
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        return None
+
+    def do_GET(self) -> None:
+        api = self.server.api
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        time.sleep(api.delay())
+        if api.throttle():
+            api.count("429")
+            self.send_json(
+                {"message": "Too many requests"},
+                429,
+                {"Retry-After": str(api.options["retry_after"])},
+            )
+            return
+        status = api.failure(url.path)
+        if status:
+            api.count(str(status))
+            self.send_json({"message": "Injected failure"}, status)
+            return
+        try:
+            endpoint, test_id, body = self.route(api, url.path, query)
+        except LookupError:
+            api.count("404")
+            self.send_json({"message": "Not found"}, 404)
+            return
+        api.count(endpoint, test_id, len(body))
+        self.send_body(body)
+
+    def route(self, api: MockAPI, path: str, query: dict):
+        """
+        Returns (endpoint name, test id or None, response body)
+        """
+        if path == "/v2/synthetics/tests":
+            page = int(query.get("page", ["1"])[0])
+            return "synthetics_tests", None, self.dumps(api.synthetics_tests(page))
+
+        match = SYNTHETICS_TEST.match(path)
+        if match:
+            test_id = int(match.group(1))
+            if not 1 <= test_id <= api.options["tests"]:
+                raise LookupError(path)
+            location = query.get("locationId", [api.location_ids()[0]])[0]
+            if match.group(2) == "/runs":
+                since = _epoch(query["startTime"][0]) * 1000 if "startTime" in query else 0
+                until = _epoch(query["endTime"][0]) * 1000 if "endTime" in query else None
+                runs = [
+                    {"timestamp": _iso(run), "locationId": location}
+                    for run in api.synthetics_runs(test_id, location, since, until)
+                ]
+                return "synthetics_runs", test_id, self.dumps({"runs": runs})
+            if match.group(2) == "/artifacts":
+                timestamp = query.get("timestamp", ["0"])[0]
+                har_path = f"/v2/synthetics/tests/{test_id}/artifacts/har"
+                artifacts = [
+                    {"type": "screenshot", "url": f"{har_path}?kind=screenshot"},
+                ]
+                if (test_id, location, int(timestamp)) not in api.without_har:
+                    artifacts.append(
+                        {
+                            "type": "har",
+                            "url": f"{har_path}?locationId={location}&timestamp={timestamp}",
+                        }
+                    )
+                return "synthetics_artifacts", test_id, self.dumps({"artifacts": artifacts})
+            return "synthetics_har", test_id, api.har
+
+        if path == "/v7/tests/web-transactions":
+            tests = [
+                {
+                    "testId": test_id,
+                    "testName": f"Web transaction {test_id}",
+                    "type": "web-transactions",
+                    "interval": api.options["interval"],
+                }
+                for test_id in range(1, api.options["tests"] + 1)
+            ]
+            return "te_tests", None, self.dumps({"tests": tests})
+
+        match = TE_RESULTS.match(path)
+        if match:
+            test_id = int(match.group(1))
+            if not 1 <= test_id <= api.options["tests"]:
+                raise LookupError(path)
+            if match.group(4) is not None:
+                page = int(match.group(4))
+                if page >= len(api.round_pages):
+                    raise LookupError(path)
+                return "te_page", test_id, api.round_pages[page]
+            if match.group(2) is not None:
+                # The client counts 1 + the sum of the pageNum values it is given
+                pages = [{"pageNum": len(api.round_pages) - 1}]
+                return "te_round", test_id, self.dumps({"results": [{"pages": pages}]})
+            return "te_results", test_id, self.dumps(api.te_results(test_id, query))
+
+        raise LookupError(path)
+
+    @staticmethod
+    def dumps(payload) -> bytes:
+        return json.dumps(payload).encode("utf-8")
+
+    def send_json(self, payload, status: int = 200, headers=None) -> None:
+        self.send_body(self.dumps(payload), status, headers)
+
+    def send_body(self, body: bytes, status: int = 200, headers=None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockAPIServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server for a MockAPI, serving on 127.0.0.1 (on a free port by
+    default) from a background thread once started
+    """
+
+    daemon_threads = True
+
+    def __init__(self, api: MockAPI, port: int = 0) -> None:
+        super().__init__(("127.0.0.1", port), Handler)
+        self.api = api
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "MockAPIServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds an option for every MockAPI setting
+    """
+    helps = {
+        "tests": "tests of each platform",
+        "locations": "Synthetics locations / ThousandEyes agents per test",
+        "frequency": "Synthetics test frequency in minutes",
+        "interval": "ThousandEyes test interval in seconds",
+        "tests_per_page": "Synthetics tests per page of the test list",
+        "entries": "HAR entries per Synthetics run and per ThousandEyes round",
+        "pages": "pages per HAR and per ThousandEyes round",
+        "transactions": "business transaction steps per HAR",
+        "latency": "seconds added to every response",
+        "jitter": "random +/- seconds added to the latency",
+        "throttle_rate": "share of requests answered with 429",
+        "retry_after": "Retry-After seconds sent with a 429",
+        "seed": "seed of the generated payloads and throttling",
+    }
+    for name, default in DEFAULTS.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(default), default=default, help=helps[name]
+        )
+
+
+def options(args: argparse.Namespace) -> dict:
+    return {name: getattr(args, name) for name in DEFAULTS}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--port", type=int, default=8089)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockAPIServer(MockAPI(**options(args)), args.port)
+    print(f"Synthetics o11y_url:        {server.url}")
+    print(f"ThousandEyes api_endpoint:  {server.url}/v7")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.api.take_stats(), indent=2))
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Generators of synthetic, browser-like HAR data in the shapes the add-on ingests:
+Splunk Synthetics HAR artifacts and ThousandEyes web transaction result pages.
+
+Output is deterministic for a given seed. Entries cycle through documents,
+scripts, stylesheets, images, fonts and XHR calls with realistic headers, timings
+and sizes, spread over pages and business transaction steps.
+"""
+import json
+import random
+
+START_MS = 1717236000000
+
+RESOURCES = (
+    # (mime type, extension, method, share of entries, typical size)
+    ("text/html", "html", "GET", 2, 48000),
+    ("application/javascript", "js", "GET", 30, 120000),
+    ("text/css", "css", "GET", 10, 30000),
+    ("image/webp", "webp", "GET", 30, 22000),
+    ("font/woff2", "woff2", "GET", 6, 40000),
+    ("application/json", "json", "POST", 22, 2500),
+)
+HOSTS = (
+    "www.example.com",
+    "cdn.example.com",
+    "static.example-cdn.net",
+    "api.example.com",
+    "fonts.gstatic.com",
+    "www.google-analytics.com",
+)
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/125.0.0.0 Safari/537.36"
+)
+
+
+def _headers(pairs):
+    return [{"name": name, "value": value} for name, value in pairs]
+
+
+def make_entry(rng: random.Random, index: int, page_ref: str, step: int, started_ms: int):
+    mime, ext, method, _, size = rng.choices(
+        RESOURCES, weights=[r[3] for r in RESOURCES]
+    )[0]
+    host = rng.choice(HOSTS)
+    url = f"https://{host}/assets/{index // 7}/{index}.{ext}?v={rng.getrandbits(32):08x}"
+    body_size = max(0, int(rng.gauss(size, size / 3)))
+    timings = {
+        "blocked": round(rng.uniform(0, 5), 3),
+        "dns": round(rng.uniform(0, 20), 3) if index % 9 == 0 else -1,
+        "connect": round(rng.uniform(5, 40), 3) if index % 9 == 0 else -1,
+        "ssl": round(rng.uniform(5, 30), 3) if index % 9 == 0 else -1,
+        "send": round(rng.uniform(0, 1), 3),
+        "wait": round(rng.uniform(10, 300), 3),
+        "receive": round(rng.uniform(1, 80), 3),
+    }
+    request = {
+        "method": method,
+        "url": url,
+        "httpVersion": "h2",
+        "headers": _headers(
+            (
+                (":authority", host),
+                ("user-agent", USER_AGENT),
+                ("accept", "*/*" if method == "GET" else "application/json"),
+                ("accept-encoding", "gzip, deflate, br"),
+                ("accept-language", "en-US,en;q=0.9"),
+                ("referer", "https://www.example.com/"),
+                ("cookie", f"session={rng.getrandbits(64):016x}; consent=1"),
+                ("sec-fetch-mode", "cors" if method == "POST" else "no-cors"),
+            )
+        ),
+        "queryString": [{"name": "v", "value": url.rsplit("=", 1)[1]}],
+        "cookies": [{"name": "session", "value": "redacted"}],
+        "headersSize": -1,
+        "bodySize": 0,
+    }
+    if method == "POST":
+        request["postData"] = {
+            "mimeType": "application/json",
+            "text": json.dumps({"event": "view", "index": index, "payload": "x" * 200}),
+        }
+    response = {
+        "status": 200 if index % 50 else 304,
+        "statusText": "",
+        "httpVersion": "h2",
+        "headers": _headers(
+            (
+                ("content-type", mime),
+                ("content-length", str(body_size)),
+                ("cache-control", "public, max-age=31536000"),
+                ("date", "Sat, 01 Jun 2024 10:00:00 GMT"),
+                ("etag", f'"{rng.getrandbits(48):012x}"'),
+                ("server", "nginx"),
+                ("vary", "Accept-Encoding"),
+                ("x-cache", rng.choice(("HIT", "MISS"))),
+                ("strict-transport-security", "max-age=63072000"),
+            )
+        ),
+        "cookies": [],
+        "content": {"size": body_size, "mimeType": mime, "compression": body_size // 3},
+        "redirectURL": "",
+        "headersSize": -1,
+        "bodySize": body_size * 2 // 3,
+        "_transferSize": body_size * 2 // 3 + 400,
+    }
+    started = started_ms + index * 7
+    return {
+        "pageref": page_ref,
+        "_btref": step,
+        "startedDateTime": _iso(started),
+        "time": round(sum(t for t in timings.values() if t > 0), 3),
+        "request": request,
+        "response": response,
+        "cache": {},
+        "timings": timings,
+        "serverIPAddress": f"203.0.113.{index % 254 + 1}",
+        "connection": str(index % 12),
+        "_priority": rng.choice(("High", "Medium", "Low")),
+        "_resourceType": ext,
+    }
+
+
+def _iso(epoch_ms: int) -> str:
+    seconds, millis = divmod(epoch_ms, 1000)
+    minutes, sec = divmod(seconds, 60)
+    hours, minute = divmod(minutes, 60)
+    return f"2024-06-01T{hours % 24:02d}:{minute:02d}:{sec:02d}.{millis:03d}Z"
+
+
+def _page_refs(pages: int, transactions: int):
+    return [f"page_{p}" for p in range(max(1, pages))], max(1, transactions)
+
+
+def iter_entries(entries: int, pages: int = 1, transactions: int = 1, seed: int = 0):
+    """
+    Yields (page index, entry) for entries spread evenly over pages and business
+    transaction steps, in request order
+    """
+    rng = random.Random(seed)
+    page_refs, steps = _page_refs(pages, transactions)
+    per_page = -(-entries // len(page_refs))
+    for i in range(entries):
+        page = min(i // per_page, len(page_refs) - 1)
+        step = min(i * steps // max(1, entries), steps - 1)
+        yield page, make_entry(rng, i, page_refs[page], step, START_MS)
+
+
+def write_synthetics_har(
+    fp, entries: int, pages: int = 1, transactions: int = 1, seed: int = 0
+) -> None:
+    """
+    Writes a Splunk Synthetics HAR artifact to a binary file, one entry at a time,
+    so even the largest sizes are generated without holding the HAR in memory
+    """
+    page_refs, steps = _page_refs(pages, transactions)
+    head = {
+        "version": "1.2",
+        "creator": {"name": "synthetic_har", "version": "1.0"},
+        "pages": [
+            {
+                "id": ref,
+                "title": f"https://www.example.com/step/{p}",
+                "startedDateTime": _iso(START_MS + p * 1000),
+                "pageTimings": {"onContentLoad": 812.5, "onLoad": 1520.2},
+                "_webVitals": {"lcp": 1320, "cls": 0.02, "tbt": 140},
+            }
+            for p, ref in enumerate(page_refs)
+        ],
+        "_groupData": [
+            {"position": step, "name": f"Step {step + 1}"} for step in range(steps)
+        ],
+    }
+    fp.write(b'{"log": ')
+    fp.write(json.dumps(head)[:-1].encode("utf-8"))
+    fp.write(b', "entries": [')
+    for i, (_, entry) in enumerate(iter_entries(entries, pages, transactions, seed)):
+        if i:
+            fp.write(b", ")
+        fp.write(json.dumps(entry).encode("utf-8"))
+    fp.write(b"]}}")
+
+
+def te_round_pages(
+    entries: int, pages: int = 1, transactions: int = 1, seed: int = 0, test_name="bench"
+) -> list:
+    """
+    Returns the serialized result pages of one ThousandEyes web transaction round,
+    as /test-results/{id}/web-transactions/agent/{agent}/round/{round}/page/{n}
+    returns them
+    """
+    page_entries = [[] for _ in range(max(1, pages))]
+    for page, entry in iter_entries(entries, pages, transactions, seed):
+        page_entries[page].append(entry)
+    return [
+        json.dumps(
+            {
+                "test": {"testId": 1, "testName": test_name},
+                "results": [
+                    {
+                        "_links": {
+                            "appLink": {
+                                "href": f"https://app.thousandeyes.com/view/tests/?page={p}"
+                            }
+                        },
+                        "agent": {"agentId": 1, "agentName": "bench-agent"},
+                        "har": {"log": {"version": "1.2", "entries": items}},
+                    }
+                ],
+            }
+        ).encode("utf-8")
+        for p, items in enumerate(page_entries)
+    ]
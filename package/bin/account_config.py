@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+import traceback
+
+import import_declare_test
+from solnlib import conf_manager
+
+ADDON_NAME = "haringester_addon_for_splunk"
+ACCOUNT_CONF = "haringester_addon_for_splunk_account"
+
+# Decrypted accounts are re-read from splunkd at least this often
+CACHE_TTL = 300
+
+_APP_LOCAL_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "local"
+)
+# Saving an account rewrites its stanza and, for the token, the app's passwords.conf
+_WATCHED_FILES = (
+    os.path.join(_APP_LOCAL_DIR, f"{ACCOUNT_CONF}.conf"),
+    os.path.join(_APP_LOCAL_DIR, "passwords.conf"),
+)
+
+_lock = threading.Lock()
+# Session key -> {"accounts", "loaded", "signature"}
+_cache = {}
+
+
+def _conf_signature() -> tuple:
+    signature = []
+    for path in _WATCHED_FILES:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def invalidate() -> None:
+    with _lock:
+        _cache.clear()
+
+
+def get_account_config(session_key: str, logger):
+    """
+    Returns every account of the add-on as {account name: decrypted settings}.
+
+    Decrypting the credentials is a REST round trip to splunkd, so the result is kept
+    in memory for the life of the process until CACHE_TTL expires or the account or
+    password conf files change on disk. Decrypted tokens are never written to disk.
+
+    The cache is kept per session key, so a caller is only ever given accounts that
+    splunkd decrypted under its own session: in the persistent get_tests REST
+    handler, one user's cached tokens are never served to another user.
+
+    Only long-lived processes benefit: the persistent get_tests REST handler (for
+    requests of the same login session) and the inputs in single-instance mode.
+    With single_instance off, every input run is a new process that starts with an
+    empty cache and reads the accounts once.
+    """
+    signature = _conf_signature()
+    with _lock:
+        now = time.monotonic()
+        entry = _cache.get(session_key)
+        if (
+            entry is not None
+            and entry["signature"] == signature
+            and now - entry["loaded"] < CACHE_TTL
+        ):
+            return entry["accounts"]
+
+        try:
+            cfm = conf_manager.ConfManager(
+                session_key,
+                ADDON_NAME,
+                realm=f"__REST_CREDENTIAL__#{ADDON_NAME}#configs/conf-{ACCOUNT_CONF}",
+            )
+            accounts = cfm.get_conf(ACCOUNT_CONF).get_all()
+        except Exception:
+            logger.error(
+                f"Error occurred while reading {ACCOUNT_CONF}.conf - {traceback.format_exc()}"
+            )
+            return None
+
+        # Expired sessions are dropped, so the handler's cache doesn't grow with logins
+        for key in [k for k, e in _cache.items() if now - e["loaded"] >= CACHE_TTL]:
+            del _cache[key]
+        _cache[session_key] = {
+            "accounts": accounts,
+            "loaded": time.monotonic(),
+            "signature": signature,
+        }
+        logger.debug(f"Loaded {len(accounts)} account(s) from {ACCOUNT_CONF}.conf")
+        return accounts
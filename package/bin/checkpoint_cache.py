@@ -0,0 +1,124 @@
+import json
+import os
+
+from har_utils import get_state_dir, safe_filename
+
+# Buffered checkpoint updates are written to the KV store once this many are pending
+FLUSH_EVERY = 100
+# Page size for the bulk query that loads an input's checkpoints
+QUERY_PAGE_SIZE = 1000
+# Documents per batch_update call, below the KV store's max_documents_per_batch_save
+BATCH_SIZE = 500
+
+
+class CheckpointCache:
+    """
+    Drop-in replacement for KVStoreCheckpointer.get/update that turns one KV store
+    REST call per test/location into a single bulk query at the start of the run and
+    a handful of batch_update calls.
+
+    Updates are buffered and flushed every FLUSH_EVERY updates and at the end of the
+    run. Each buffered update is also appended to a local journal file, which is
+    replayed and flushed on the next start if the process died before flushing.
+    """
+
+    def __init__(self, checkpointer, input_name: str, logger, flush_every=FLUSH_EVERY):
+        self._checkpointer = checkpointer
+        self._logger = logger
+        self._flush_every = flush_every
+        self._states = {}
+        self._pending = {}
+        self._journal = None
+        self._journal_path = os.path.join(
+            get_state_dir("checkpoint_journal"), f"{safe_filename(input_name)}.jsonl"
+        )
+        self._loaded = self._load()
+        self._replay_journal()
+
+    def _load(self) -> bool:
+        """
+        Loads every checkpoint of the input's collection in as few queries as possible
+        """
+        collection = getattr(self._checkpointer, "_collection_data", None)
+        if collection is None:
+            return False
+        try:
+            skip = 0
+            while True:
+                records = collection.query(skip=skip, limit=QUERY_PAGE_SIZE)
+                for record in records:
+                    self._states[record["_key"]] = json.loads(record["state"])
+                if len(records) < QUERY_PAGE_SIZE:
+                    break
+                skip += len(records)
+        except Exception as e:
+            self._logger.warning(
+                f"Bulk checkpoint load failed, falling back to per-key reads: {e}"
+            )
+            self._states = {}
+            return False
+        self._logger.debug(f"Loaded {len(self._states)} checkpoints")
+        return True
+
+    def _replay_journal(self) -> None:
+        if not os.path.exists(self._journal_path):
+            return
+        replayed = 0
+        with open(self._journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write
+                    continue
+                self._states[record["_key"]] = record["state"]
+                self._pending[record["_key"]] = record["state"]
+                replayed += 1
+        self._logger.info(f"Replaying {replayed} journaled checkpoint updates")
+        self.flush()
+
+    def get(self, key: str):
+        if key in self._states:
+            return self._states[key]
+        if self._loaded:
+            return None
+        return self._checkpointer.get(key)
+
+    def items(self, prefix: str = "") -> dict:
+        """
+        Returns the loaded checkpoints whose key starts with prefix, or None when the
+        bulk load failed and only per-key reads are available
+        """
+        if not self._loaded:
+            return None
+        return {
+            key: state for key, state in self._states.items() if key.startswith(prefix)
+        }
+
+    def update(self, key: str, state) -> None:
+        self._states[key] = state
+        self._pending[key] = state
+        if self._journal is None:
+            self._journal = open(self._journal_path, "a", encoding="utf-8")
+        self._journal.write(json.dumps({"_key": key, "state": state}) + "\n")
+        self._journal.flush()
+        if len(self._pending) >= self._flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes buffered updates to the KV store and clears the journal
+        """
+        if self._pending:
+            states = [
+                {"_key": key, "state": state} for key, state in self._pending.items()
+            ]
+            for i in range(0, len(states), BATCH_SIZE):
+                self._checkpointer.batch_update(states[i : i + BATCH_SIZE])
+            self._logger.debug(f"Flushed {len(states)} checkpoint updates")
+            self._pending.clear()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self._journal_path):
+            os.remove(self._journal_path)
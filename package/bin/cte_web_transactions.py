@@ -1,8 +1,83 @@
-from har_utils import write_events, make_session, fetch_data
-from datetime import datetime
-import sys
+from har_utils import (
+    write_events,
+    make_session,
+    fetch_data,
+    bounded_map,
+    get_state_dir,
+    load_state,
+    safe_filename,
+    save_state,
+)
+from har_normalizer import HarEntry, HarNormalizer, ThousandEyesAdapter
+from field_rules import FieldRules
+from large_events import LargeEventPolicy
+from rate_limiter import THOUSANDEYES_REQUESTS_PER_MINUTE, make_rate_limiter
+from solnlib.utils import is_true
+from retry_queue import RetryQueue
+from run_metrics import RunMetrics
+from typing import Iterator
+import os, time, traceback
 
-EPOCH = datetime(1970, 1, 1)
+# Upper bound on concurrent page requests issued per account by a single input
+MAX_PAGE_WORKERS = 4
+# Age in seconds after which the test list is fetched again rather than reused
+INVENTORY_REFRESH = 900
+# Longest window of rounds requested per test, however old its oldest checkpoint is
+RESULTS_WINDOW_MAX = 3600
+
+
+class RoundSnapshot:
+    """
+    Persisted view of an input's web transaction tests: the test list with each
+    test's interval, and the oldest latest round seen across the test's agents.
+
+    A test whose next round can't have started yet (that round + interval is still
+    in the future) is skipped before any per-test API call is made. The test list
+    itself is only re-fetched every INVENTORY_REFRESH seconds.
+    """
+
+    def __init__(self, input_name: str) -> None:
+        self.path = os.path.join(
+            get_state_dir("inventory"), f"te_{safe_filename(input_name)}.json"
+        )
+        state = load_state(self.path) or {}
+        self.updated = state.get("updated", 0)
+        self.tests = state.get("tests")
+        self.rounds = state.get("rounds", {})
+
+    def inventory(self):
+        if self.tests and time.time() - self.updated < INVENTORY_REFRESH:
+            return self.tests
+        return None
+
+    def set_inventory(self, tests: list) -> None:
+        self.tests = tests
+        self.updated = time.time()
+        # Drop rounds of tests that no longer exist
+        test_ids = {str(test.get("testId")) for test in tests}
+        self.rounds = {k: v for k, v in self.rounds.items() if k in test_ids}
+
+    def round_due(self, test: dict, now: float) -> bool:
+        last_round = self.rounds.get(str(test.get("testId")))
+        interval = test.get("interval")
+        if not last_round or not interval:
+            return True
+        return last_round + int(interval) <= now
+
+    def set_round(self, test_id, results: list) -> None:
+        latest = {}
+        for result in results:
+            if result.get("roundId"):
+                agent_id = result.get("agentId")
+                latest[agent_id] = max(latest.get(agent_id, 0), result["roundId"])
+        if latest:
+            self.rounds[str(test_id)] = min(latest.values())
+
+    def save(self) -> None:
+        save_state(
+            self.path,
+            {"updated": self.updated, "tests": self.tests, "rounds": self.rounds},
+        )
 
 
 class ThousandEyes:
@@ -17,61 +92,96 @@ class ThousandEyes:
             "Authorization": f"Bearer {self.access_token}",
         }
         self.api_endpoint = config["api_endpoint"]
+        self.page_workers = max(1, int(config.get("page_workers", MAX_PAGE_WORKERS)))
         self._logger = logger
+        self.metrics = RunMetrics(config.get("input_name"))
+        self.field_rules = FieldRules.compile(config.get("field_rules"))
+        self.compact_headers = is_true(config.get("compact_headers"))
+        self.millisecond_timestamps = is_true(config.get("millisecond_timestamps"))
+
+    def fetch_pages(
+        self, session, har_endpoints: list, metrics=None
+    ) -> Iterator[dict]:
+        """
+        Fetches every page of a round with bounded parallelism, yielded in page order
+        as soon as each page and the ones before it have arrived
+        """
+        workers = min(self.page_workers, len(har_endpoints)) or 1
+        started = time.perf_counter()
+        metrics = metrics or self.metrics
+
+        def fetch_page(ep):
+            self._logger.debug(f"get_har looking for endpoint: {ep}")
+            with metrics.phase("fetch_page"):
+                return fetch_data(session, ep, "", self._logger, metrics=metrics)
 
-    def get_har(self, session, test_id, page) -> list:
-        har_results = []
+        if workers == 1:
+            for ep in har_endpoints:
+                yield fetch_page(ep)
+        else:
+            for _, data in bounded_map(fetch_page, har_endpoints, workers):
+                yield data
+
+        self._logger.debug(
+            f"fetch_pages fetched {len(har_endpoints)} pages with {workers} workers in {time.perf_counter() - started:.3f}s"
+        )
+
+    def get_har(self, session, test_id, page) -> Iterator[HarEntry]:
+        """
+        Yields the enriched HAR entries of every page of a round, page by page
+        """
+        for _, entries in self.get_har_pages(session, test_id, page):
+            yield from entries
+
+    def get_har_pages(
+        self, session, test_id, page, start_page: int = 0
+    ) -> Iterator[tuple]:
+        """
+        Yields (page number, HAR entries of the page) for the pages of a round from
+        start_page on, in page order
+        """
         har_endpoints = []
 
         agent_id = page.get("agentId")
         round = page.get("roundId")
         page_num = page.get("pageNum")
 
-        for p in range(0, page_num):
+        for p in range(start_page, page_num):
             har_endpoint = f"/test-results/{test_id}/web-transactions/agent/{agent_id}/round/{round}/page/{p}"
             har_url = f"{self.api_endpoint}{har_endpoint}"
             har_endpoints.append(har_url)
 
-        for ep in har_endpoints:
-            self._logger.debug(f"get_har looking for endpoint: {ep}")
-            data = fetch_data(session, ep, "", self._logger)
-
-            test_name = data["test"]["testName"]
-            for result in data["results"]:
-                deep_link = result["_links"]["appLink"]["href"]
-                location = result["agent"]["agentName"]
-
-                har = result["har"]["log"]
-
-                for request in har["entries"]:
-                    if "postData" in request["request"]:
-                        request["request"]["postData"] = "REMOVED"
-                    start_time = (
-                        datetime.strptime(
-                            request["startedDateTime"], "%Y-%m-%dT%H:%M:%S.%fZ"
-                        )
-                        - EPOCH
-                    )
-                    start_time_epoch = int(start_time.total_seconds())
-                    request["startedDateTime"] = start_time_epoch
-                    request["transaction_details"] = {
-                        "id": test_id,
-                        "name": test_name,
-                        "location": location,
-                        "run_time": round,
-                        "deep_link": deep_link,
-                    }
+        metrics = self.metrics.for_test(test_id)
+        for p, data in enumerate(
+            self.fetch_pages(session, har_endpoints, metrics), start=start_page
+        ):
+            yield p, self._page_entries(test_id, round, data)
 
-                    har_results.append(request)
-        return har_results
+    def _page_entries(self, test_id, round, data: dict) -> Iterator[HarEntry]:
+        test_name = data["test"]["testName"]
+        for result in data["results"]:
+            deep_link = result["_links"]["appLink"]["href"]
+            location = result["agent"]["agentName"]
+
+            normalizer = HarNormalizer(
+                ThousandEyesAdapter(test_id, test_name, location, round, deep_link),
+                self.field_rules,
+                self.compact_headers,
+                self.millisecond_timestamps,
+            )
+            yield from normalizer.entries(result["har"]["log"]["entries"])
 
     def get_page_count(self, session, testId, results) -> list:
         pages = []
+        metrics = self.metrics.for_test(testId)
         for result in results:
             agentId = result.get("agentId")
             round = result.get("roundId")
             pages_url = f"{self.api_endpoint}/test-results/{testId}/web-transactions/agent/{agentId}/round/{round}"
-            get_page = fetch_data(session, pages_url, "", self._logger)
+            with metrics.phase("get_page_count"):
+                get_page = fetch_data(
+                    session, pages_url, "", self._logger, metrics=metrics
+                )
             for pr in get_page["results"]:
                 pageNum = 1
                 for page_list in pr["pages"]:
@@ -81,10 +191,29 @@ class ThousandEyes:
         self._logger.debug(f"get_page_count returns: {pages}")
         return pages
 
-    def get_test_results(self, session, testId) -> list:
+    def results_window(self, checkpoints: dict) -> dict:
+        """
+        Query parameters limiting a test's results to the rounds after its oldest
+        agent checkpoint, or no parameters when the test has no checkpoints yet
+        """
+        rounds = [state.get("checkpoint") or 0 for state in (checkpoints or {}).values()]
+        if not rounds or not min(rounds):
+            return {}
+        now = int(time.time())
+        start = max(min(rounds) + 1, now - RESULTS_WINDOW_MAX)
+        return {
+            "startDate": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start)),
+            "endDate": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+        }
+
+    def get_test_results(self, session, testId, params=None) -> list:
         results_endpoint = f"/test-results/{testId}/web-transactions"
         results_url = f"{self.api_endpoint}{results_endpoint}"
-        result_data = fetch_data(session, results_url, "", self._logger)
+        metrics = self.metrics.for_test(testId)
+        with metrics.phase("get_test_results"):
+            result_data = fetch_data(
+                session, results_url, params or "", self._logger, metrics=metrics
+            )
         agent_data = []
         for result in result_data["results"]:
             agent_data.append(
@@ -99,9 +228,10 @@ class ThousandEyes:
     def get_tests(self, session) -> list:
         web_transactions_endpoint = "/tests/web-transactions"
         web_transactions_url = f"{self.api_endpoint}{web_transactions_endpoint}"
-        web_transaction_data = fetch_data(
-            session, web_transactions_url, "", self._logger
-        )
+        with self.metrics.phase("get_tests"):
+            web_transaction_data = fetch_data(
+                session, web_transactions_url, "", self._logger, metrics=self.metrics
+            )
         my_data = []
         if "tests" in web_transaction_data:
             for test in web_transaction_data["tests"]:
@@ -110,28 +240,195 @@ class ThousandEyes:
                     {
                         "testId": test.get("testId"),
                         "testName": test.get("testName"),
+                        "interval": test.get("interval"),
                     }
                 )
             return my_data
 
 
-def get_web_transactions(checkpointer, config, logger, event_writer):
+def round_key(test_id, result: dict) -> str:
+    return f'{test_id}_{result.get("agentId", 0)}_{result.get("roundId", 0)}'
+
+
+def round_item(checkpointer, test_id, result: dict, start_page: int) -> dict:
+    """
+    Retry queue item for a failed round, resuming after its last written page
+    """
+    state = checkpointer.get(f'{test_id}_{result.get("agentId", 0)}') or {}
+    if state.get("round") == result.get("roundId"):
+        start_page = state.get("page", start_page)
+    return {
+        "test_id": test_id,
+        "agentId": result.get("agentId", 0),
+        "roundId": result.get("roundId", 0),
+        "page": start_page or 0,
+    }
+
+
+def skip_round(checkpointer, test_id, result: dict) -> None:
+    """
+    Moves an agent's checkpoint past a round given up on, so later runs don't find
+    it again and start its retries over
+    """
+    checkpoint_name = f'{test_id}_{result.get("agentId", 0)}'
+    state = checkpointer.get(checkpoint_name) or {}
+    checkpointer.update(
+        checkpoint_name,
+        {"checkpoint": max(state.get("checkpoint", 0), result.get("roundId", 0))},
+    )
+
+
+def ingest_round(
+    client,
+    session,
+    checkpointer,
+    test_id,
+    result,
+    start_page,
+    config,
+    logger,
+    event_writer,
+    large_events,
+) -> None:
+    """
+    Writes the pages of one agent's round, checkpointing after every page. Without
+    a start_page, a round interrupted part-way resumes after its last written page.
+    """
+    for page in client.get_page_count(session, test_id, [result]):
+        transaction_round = page.get("roundId", 0)
+        checkpoint_name = f'{test_id}_{page.get("agentId", 0)}'
+        state = checkpointer.get(checkpoint_name) or {}
+        completed = state.get("checkpoint", 0)
+
+        if start_page is None:
+            start_page = 0
+            if state.get("round") == transaction_round:
+                start_page = state.get("page", 0)
+        if start_page:
+            logger.info(
+                f"Resuming test={test_id} agent={page.get('agentId')} "
+                f"round={transaction_round} at page {start_page}"
+            )
+
+        for page_index, data in client.get_har_pages(
+            session, test_id, page, start_page
+        ):
+            write_events(
+                data,
+                config,
+                logger,
+                event_writer,
+                large_events,
+                client.metrics.for_test(test_id),
+            )
+            checkpointer.update(
+                checkpoint_name,
+                {
+                    "checkpoint": completed,
+                    "round": transaction_round,
+                    "page": page_index + 1,
+                },
+            )
+        # A retried round may be older than rounds ingested since it failed
+        checkpointer.update(
+            checkpoint_name, {"checkpoint": max(completed, transaction_round)}
+        )
+
+
+def get_web_transactions(checkpointer, config, logger, event_writer, sessions=None):
+    """
+    Ingests the new rounds of every web transaction test. The run's timings and
+    volumes are written as one summary event once it ends, whether or not it failed.
+    """
     client = ThousandEyes(config, logger)
-    session = make_session(client.header)
+    status = "error"
+    try:
+        _poll(client, checkpointer, config, logger, event_writer, sessions)
+        status = "ok"
+    finally:
+        client.metrics.write(event_writer, config, logger, status)
+
 
-    test_inventory = client.get_tests(session)
+def _poll(client, checkpointer, config, logger, event_writer, sessions):
+    rate_limiter = make_rate_limiter(config, THOUSANDEYES_REQUESTS_PER_MINUTE)
+    if sessions is not None:
+        # Single-instance mode: the account's session outlives this run
+        session = sessions.get(config.get("account"), client.header, rate_limiter)
+    else:
+        session = make_session(client.header, rate_limiter=rate_limiter)
+    large_events = LargeEventPolicy.from_config(config)
+
+    snapshot = RoundSnapshot(config["input_name"]) if config.get("input_name") else None
+    test_inventory = snapshot.inventory() if snapshot else None
+    if test_inventory is None:
+        test_inventory = client.get_tests(session)
+        if test_inventory and snapshot:
+            snapshot.set_inventory(test_inventory)
 
     if not test_inventory:
         logger.error("No active checks found.")
-        sys.exit()
+        if sessions is None:
+            session.close()
+        return
+
+    retry_queue = None
+    if config.get("input_name"):
+        # Rounds that failed on earlier runs go first, once their backoff has elapsed
+        retry_queue = RetryQueue(config["input_name"], logger)
+        for key, item in retry_queue.due():
+            result = {"agentId": item["agentId"], "roundId": item["roundId"]}
+            try:
+                ingest_round(
+                    client,
+                    session,
+                    checkpointer,
+                    item["test_id"],
+                    result,
+                    item.get("page", 0),
+                    config,
+                    logger,
+                    event_writer,
+                    large_events,
+                )
+            except Exception as e:
+                logger.error(f"Retry of {key} failed: {traceback.format_exc()}")
+                if not retry_queue.add(
+                    key,
+                    round_item(
+                        checkpointer, item["test_id"], result, item.get("page", 0)
+                    ),
+                    f"{type(e).__name__}: {e}",
+                ):
+                    skip_round(checkpointer, item["test_id"], result)
+            else:
+                retry_queue.remove(key)
+
+    now = time.time()
     for test in test_inventory:
         test_id = test.get("testId")
-        results = client.get_test_results(session, test_id)
-        pages = client.get_page_count(session, test_id, results)
+        if snapshot and not snapshot.round_due(test, now):
+            logger.debug(f"No new round yet for test={test_id}")
+            continue
+        checkpoints = None
+        if hasattr(checkpointer, "items"):
+            checkpoints = checkpointer.items(f"{test_id}_")
+        try:
+            results = client.get_test_results(
+                session, test_id, client.results_window(checkpoints)
+            )
+        except Exception:
+            # Nothing was checkpointed, so the next run simply asks again
+            logger.error(
+                f"Failed to get results of test={test_id}: {traceback.format_exc()}"
+            )
+            continue
 
-        for page in pages:
-            transaction_location_id = page.get("agentId", 0)
-            transaction_round = page.get("roundId", 0)
+        # Checkpoints are compared before any page-count or page request, so only
+        # rounds that haven't been ingested cost further API calls
+        new_results = []
+        for result in sorted(results, key=lambda r: r.get("roundId") or 0):
+            transaction_location_id = result.get("agentId", 0)
+            transaction_round = result.get("roundId", 0)
 
             checkpoint_name = f"{test_id}_{transaction_location_id}"
             recent_checkpoint = checkpointer.get(checkpoint_name)
@@ -147,12 +444,44 @@ def get_web_transactions(checkpointer, config, logger, event_writer):
             )
 
             if transaction_round > recent_checkpoint:
-                data = client.get_har(session, test_id, page)
-                write_events(data, config, logger, event_writer)
-                checkpointer.update(checkpoint_name, {"checkpoint": transaction_round})
-
+                new_results.append(result)
             else:
                 logger.debug(
                     f"Already written data for test={test_id} location={transaction_location_id} runtime={transaction_round}"
                 )
-    session.close()
+
+        for result in new_results:
+            key = round_key(test_id, result)
+            if retry_queue is not None and key in retry_queue:
+                logger.debug(f"{key} is waiting in the retry queue")
+                continue
+            try:
+                ingest_round(
+                    client,
+                    session,
+                    checkpointer,
+                    test_id,
+                    result,
+                    None,
+                    config,
+                    logger,
+                    event_writer,
+                    large_events,
+                )
+            except Exception as e:
+                logger.error(f"Failed to ingest {key}: {traceback.format_exc()}")
+                if retry_queue is not None and not retry_queue.add(
+                    key,
+                    round_item(checkpointer, test_id, result, 0),
+                    f"{type(e).__name__}: {e}",
+                ):
+                    skip_round(checkpointer, test_id, result)
+        if snapshot:
+            snapshot.set_round(test_id, results)
+    if snapshot:
+        snapshot.save()
+    if retry_queue is not None:
+        retry_queue.save()
+    large_events.log_summary(logger, config.get("input_name"))
+    if sessions is None:
+        session.close()
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import re
+
+ACTIONS = ("keep", "drop", "hash", "truncate", "redact")
+# Characters kept by "truncate" when the rule doesn't give a length
+DEFAULT_TRUNCATE = 1024
+# Fields every event keeps under "keep" rules, so it can still be timed and attributed
+ALWAYS_KEPT = ("startedDateTime", "transaction_details")
+
+RULE_PATTERN = re.compile(r"^(keep|drop|hash|truncate|redact):([\w.-]+)(?::(\d+))?$")
+
+
+def _hash(value):
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return f"sha256:{hashlib.sha256(value.encode('utf-8')).hexdigest()}"
+
+
+def _truncate(limit):
+    def truncate(value):
+        if isinstance(value, str) and len(value) > limit:
+            return f"{value[:limit]}...[truncated {len(value) - limit} chars]"
+        return value
+
+    return truncate
+
+
+def _redact(value):
+    return "REMOVED"
+
+
+def _apply(node, path: tuple, transform) -> None:
+    """
+    Applies transform to the value at path below node, descending into every element
+    of the lists met on the way; transform None deletes the value
+    """
+    if isinstance(node, list):
+        for item in node:
+            _apply(item, path, transform)
+        return
+    if not isinstance(node, dict) or path[0] not in node:
+        return
+    if len(path) > 1:
+        _apply(node[path[0]], path[1:], transform)
+    elif transform is None:
+        del node[path[0]]
+    else:
+        node[path[0]] = transform(node[path[0]])
+
+
+def _project(node, tree):
+    # None marks a kept path: everything below it is emitted
+    if tree is None:
+        return node
+    if isinstance(node, list):
+        return [_project(item, tree) for item in node]
+    if not isinstance(node, dict):
+        return node
+    return {key: _project(node[key], tree[key]) for key in tree if key in node}
+
+
+class FieldRules:
+    """
+    Projection and redaction rules for HAR entry events, compiled once per run from
+    an input's "field_rules" setting. Each rule is action:dotted.path[:length]:
+
+    keep      only emit the listed paths (plus startedDateTime and transaction_details)
+    drop      remove the field
+    hash      replace the field with its SHA-256 digest
+    truncate  cap a string field at length characters (default 1024)
+    redact    replace the field with "REMOVED"
+
+    Paths address the emitted event, e.g. response.content.text or request.cookies,
+    and apply to every element of the lists they pass through, such as
+    request.headers.value. With compact headers, a header is addressed by its
+    lower-cased name, e.g. request.headers.cookie.
+    """
+
+    def __init__(self, keep_tree: dict, transforms: list) -> None:
+        self._keep_tree = keep_tree
+        self._transforms = transforms
+
+    @classmethod
+    def compile(cls, text: str):
+        """
+        Returns the rules in text (separated by commas or new lines), or None when
+        there are none. Raises ValueError for a malformed rule.
+        """
+        keep_tree = {}
+        transforms = []
+        for rule in re.split(r"[,\n]+", text or ""):
+            rule = rule.strip()
+            if not rule:
+                continue
+            match = RULE_PATTERN.match(rule)
+            if not match:
+                raise ValueError(
+                    f"Invalid field rule {rule!r}, expected one of "
+                    f"{'/'.join(ACTIONS)}:dotted.path[:length]"
+                )
+            action, path, length = match.groups()
+            path = tuple(path.split("."))
+            if path[0] in ALWAYS_KEPT:
+                # Shared by every event of the run, and needed to attribute them
+                raise ValueError(f"Field rule {rule!r} can't change {path[0]}")
+            if action == "keep":
+                node = keep_tree
+                for key in path[:-1]:
+                    if key in node and node[key] is None:
+                        break
+                    node = node.setdefault(key, {})
+                else:
+                    node[path[-1]] = None
+            elif action == "drop":
+                transforms.append((path, None))
+            elif action == "hash":
+                transforms.append((path, _hash))
+            elif action == "truncate":
+                transforms.append((path, _truncate(int(length or DEFAULT_TRUNCATE))))
+            else:
+                transforms.append((path, _redact))
+
+        if not keep_tree and not transforms:
+            return None
+        if keep_tree:
+            for key in ALWAYS_KEPT:
+                keep_tree[key] = None
+        return cls(keep_tree, transforms)
+
+    def apply(self, record: dict) -> dict:
+        if self._keep_tree:
+            record = _project(record, self._keep_tree)
+        for path, transform in self._transforms:
+            _apply(record, path, transform)
+        return record
@@ -0,0 +1,191 @@
+from har_time import iso_to_epoch
+
+
+def compact_headers(headers: list) -> dict:
+    """
+    Collapses a HAR header list [{"name": ..., "value": ...}] into a map of lower-cased
+    names to values. Repeated headers are joined with ", " as HTTP allows, except
+    Set-Cookie, whose values can't be joined and are kept as a list.
+    """
+    compact = {}
+    for header in headers:
+        name = str(header.get("name", "")).lower()
+        value = header.get("value", "")
+        if name not in compact:
+            compact[name] = value
+        elif name == "set-cookie":
+            if not isinstance(compact[name], list):
+                compact[name] = [compact[name]]
+            compact[name].append(value)
+        else:
+            compact[name] = f"{compact[name]}, {value}"
+    return compact
+
+
+class HarPage:
+    """
+    A page of a Synthetics run (i.e page 1 in the Synthetic check)
+    """
+
+    __slots__ = ("page_ref", "page_url", "started", "web_vitals")
+
+    def __init__(self, page_ref, page_url, started, web_vitals) -> None:
+        self.page_ref = page_ref
+        self.page_url = page_url
+        self.started = started
+        self.web_vitals = web_vitals
+
+    def to_dict(self) -> dict:
+        return {
+            "page_ref": self.page_ref,
+            "page_url": self.page_url,
+            "startedDateTime": self.started,
+            "web_vitals": self.web_vitals,
+        }
+
+
+class HarEntry:
+    """
+    Compact, normalized view of one HAR entry. It only references the parsed request,
+    response and timings; the event dict is built by the platform adapter right before
+    serialization, so at most one event dict is alive at a time.
+    """
+
+    __slots__ = (
+        "raw",
+        "started",
+        "page_url",
+        "business_transaction",
+        "adapter",
+        "rules",
+    )
+
+    def __init__(
+        self, raw, started, page_url, business_transaction, adapter, rules=None
+    ) -> None:
+        self.raw = raw
+        self.started = started
+        self.page_url = page_url
+        self.business_transaction = business_transaction
+        self.adapter = adapter
+        self.rules = rules
+
+    def to_dict(self) -> dict:
+        event = self.adapter.render(self)
+        if self.rules is not None:
+            event = self.rules.apply(event)
+        return event
+
+
+class SyntheticsAdapter:
+    """
+    Shapes entries of a Splunk Synthetics browser run. Synthetics adds additional
+    job-related fields that don't appear to provide value, so only standard HAR
+    components are kept.
+    """
+
+    def __init__(
+        self, test_id, test_name, location, run_time, org_id, realm, deep_link
+    ) -> None:
+        # Shared by every entry of the run
+        self.transaction_details = {
+            "id": test_id,
+            "name": test_name,
+            "location": location,
+            "org_id": org_id,
+            "realm": realm,
+            "run_time": run_time,
+            "deep_link": deep_link,
+        }
+
+    def render(self, entry: HarEntry) -> dict:
+        raw = entry.raw
+        return {
+            "business_transaction": entry.business_transaction,
+            "page_url": entry.page_url,
+            "pageref": raw["pageref"],
+            "request": raw["request"],
+            "response": raw["response"],
+            "serverIPAddress": raw.get("serverIPAddress", ""),
+            "startedDateTime": entry.started,
+            "transaction_details": self.transaction_details,
+            "time": raw["time"],
+            "timings": raw["timings"],
+        }
+
+
+class ThousandEyesAdapter:
+    """
+    Shapes entries of a ThousandEyes web transaction round: the full HAR entry plus
+    the transaction details
+    """
+
+    def __init__(self, test_id, test_name, location, run_time, deep_link) -> None:
+        self.transaction_details = {
+            "id": test_id,
+            "name": test_name,
+            "location": location,
+            "run_time": run_time,
+            "deep_link": deep_link,
+        }
+
+    def render(self, entry: HarEntry) -> dict:
+        raw = entry.raw
+        raw["startedDateTime"] = entry.started
+        raw["transaction_details"] = self.transaction_details
+        return raw
+
+
+class HarNormalizer:
+    """
+    Single-pass HAR normalization shared by both platforms. Pages and business
+    transaction steps are indexed by pageref and position as they are read, so each
+    entry is resolved with dict lookups while postData is stripped and its timestamp
+    converted in the same pass.
+    """
+
+    def __init__(self, adapter, rules=None, compact=False, millis=False) -> None:
+        self.adapter = adapter
+        # Compiled field_rules.FieldRules of the input, applied as each entry is rendered
+        self.rules = rules
+        # Emit request/response headers as a name -> value map instead of a list
+        self.compact = compact
+        # Emit startedDateTime as float epoch seconds with milliseconds, which keeps
+        # requests within a page in order, instead of whole seconds
+        self.millis = millis
+        self.page_urls = {}
+        self.business_transactions = {}
+
+    def add_page(self, page: dict, started) -> HarPage:
+        har_page = HarPage(page["id"], page["title"], started, page["_webVitals"])
+        self.page_urls.setdefault(har_page.page_ref, har_page.page_url)
+        return har_page
+
+    def add_business_transaction(self, step: dict) -> None:
+        self.business_transactions.setdefault(step["position"], step["name"])
+
+    def normalize(self, request: dict) -> HarEntry:
+        if "postData" in request["request"]:
+            request["request"]["postData"] = "REMOVED"
+        if self.compact:
+            for part in ("request", "response"):
+                headers = (request.get(part) or {}).get("headers")
+                if isinstance(headers, list):
+                    request[part]["headers"] = compact_headers(headers)
+
+        business_transaction = ""
+        if "_btref" in request:
+            business_transaction = self.business_transactions.get(request["_btref"], "")
+
+        return HarEntry(
+            request,
+            iso_to_epoch(request["startedDateTime"], millis=self.millis),
+            self.page_urls.get(request.get("pageref"), ""),
+            business_transaction,
+            self.adapter,
+            self.rules,
+        )
+
+    def entries(self, requests):
+        for request in requests:
+            yield self.normalize(request)
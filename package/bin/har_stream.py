@@ -0,0 +1,141 @@
+import codecs
+import json
+
+# Size of each read from the downloaded HAR file
+CHUNK_SIZE = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class JSONStreamReader:
+    """
+    Minimal pull parser over a binary file containing UTF-8 JSON.
+
+    Containers are walked one member at a time and only the values handed back to
+    the caller are decoded, so memory is bounded by the largest single value read
+    rather than the size of the document.
+    """
+
+    def __init__(self, fp) -> None:
+        self._fp = fp
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size: int = CHUNK_SIZE) -> bool:
+        if self._eof:
+            return False
+        raw = self._fp.read(size)
+        self._eof = not raw
+        chunk = self._decoder.decode(raw, final=self._eof)
+        if self._pos:
+            self._buf = self._buf[self._pos :]
+            self._pos = 0
+        self._buf += chunk
+        return bool(chunk) or not self._eof
+
+    def peek(self) -> str:
+        """
+        Skips whitespace and returns the next character, or "" at the end of the file
+        """
+        while True:
+            buf = self._buf
+            pos = self._pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found!r}")
+        self._pos += 1
+
+    def value(self):
+        """
+        Decodes the next complete JSON value, reading more of the file as needed
+        """
+        self.peek()
+        size = CHUNK_SIZE
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill(size):
+                    raise
+                size *= 2
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self._buf) and self._fill(size):
+                continue
+            self._pos = end
+            return value
+
+    def members(self):
+        """
+        Yields the keys of the next JSON object. The caller must consume each value.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("}")
+            return
+
+    def elements(self):
+        """
+        Yields the decoded elements of the next JSON array one at a time
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_log_items(fp, sections: tuple):
+    """
+    Yields (section, item) for every element of the arrays under the top-level "log"
+    object whose name is in sections, e.g. ("pages", "_groupData", "entries").
+    Items are produced in document order; other arrays are skipped element by element.
+    Iteration stops as soon as every requested section has been read.
+    """
+    remaining = set(sections)
+    reader = JSONStreamReader(fp)
+    if not reader.peek():
+        return
+    for key in reader.members():
+        if key != "log" or reader.peek() != "{":
+            reader.value()
+            continue
+        for log_key in reader.members():
+            if reader.peek() != "[":
+                reader.value()
+                continue
+            wanted = log_key in remaining
+            for item in reader.elements():
+                if wanted:
+                    yield log_key, item
+            if wanted:
+                remaining.discard(log_key)
+                if not remaining:
+                    return
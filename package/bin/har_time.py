@@ -0,0 +1,71 @@
+import calendar
+from datetime import datetime, timezone
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def _minute_epoch(prefix: str) -> int:
+    """
+    Epoch seconds of a "YYYY-MM-DDTHH:MM" prefix. Entries of a HAR file share a
+    handful of prefixes, so this is computed once per minute rather than per entry.
+    """
+    return calendar.timegm(
+        (
+            int(prefix[0:4]),
+            int(prefix[5:7]),
+            int(prefix[8:10]),
+            int(prefix[11:13]),
+            int(prefix[14:16]),
+            0,
+        )
+    )
+
+
+def _parse_fallback(value: str) -> int:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return (
+        calendar.timegm(parsed.utctimetuple()) * 1000
+        + (parsed.microsecond + 500) // 1000
+    )
+
+
+def iso_to_epoch_ms(value: str) -> int:
+    """
+    Converts a HAR/ThousandEyes timestamp such as "2024-06-01T10:00:00.123Z" to epoch
+    milliseconds. The fixed UTC format is sliced directly; anything else, such as an
+    explicit offset, goes through datetime.fromisoformat.
+    """
+    try:
+        if value[10] == "T" and value[16] == ":" and value[-1] == "Z":
+            seconds = int(value[17:19])
+            if value[19] == ".":
+                micros = int(value[20:-1][:6].ljust(6, "0"))
+            elif len(value) == 20:
+                micros = 0
+            else:
+                return _parse_fallback(value)
+            return (_minute_epoch(value[:16]) + seconds) * 1000 + (micros + 500) // 1000
+    except (IndexError, ValueError):
+        pass
+    return _parse_fallback(value)
+
+
+def iso_to_epoch(value: str, millis: bool = False):
+    """
+    Converts a HAR/ThousandEyes timestamp to epoch seconds: an int by default, or a
+    float keeping millisecond precision when millis is True
+    """
+    epoch_ms = iso_to_epoch_ms(value)
+    if millis:
+        return epoch_ms / 1000
+    return epoch_ms // 1000
+
+
+def epoch_ms_to_iso(epoch_ms: int) -> str:
+    """
+    Formats epoch milliseconds as a UTC timestamp such as "2024-06-01T10:00:00.123Z"
+    """
+    parsed = datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+    return f"{parsed.strftime('%Y-%m-%dT%H:%M:%S')}.{epoch_ms % 1000:03d}Z"
@@ -1,85 +1,458 @@
 import import_declare_test
-from solnlib import conf_manager, log
-from splunklib import modularinput as smi
-import json, requests, sys, traceback
+from solnlib import log
+from solnlib.splunkenv import make_splunkhome_path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from io import TextIOBase
+from large_events import LargeEventPolicy, payload_size
+from requests.adapters import HTTPAdapter
+from xml.sax.saxutils import escape
+import json, os, random, re, requests, tempfile, threading, time, traceback
 
 ADDON_NAME = "haringester_addon_for_splunk"
 
+# Downloads larger than this are spooled to a temporary file instead of memory
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
-def get_account_config(session_key: str, logger):
+# Connections kept per host, sized for the test and page worker pools
+POOL_MAXSIZE = 16
+# (connect, read) timeouts in seconds; HAR downloads get a longer read timeout
+DEFAULT_TIMEOUT = (10, 60)
+DOWNLOAD_TIMEOUT = (10, 300)
+# Throttled, unavailable and timed out requests are retried with exponential
+# backoff and full jitter, unless the API says how long to wait
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 120.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RATE_LIMIT_RESET_HEADERS = ("x-organization-rate-limit-reset", "x-ratelimit-reset")
+
+# Buffered events are written to the output stream once either limit is reached
+BATCH_MAX_EVENTS = 500
+BATCH_MAX_BYTES = 1024 * 1024
+
+# Serializes writes to the shared output stream when stanzas run as threads
+OUTPUT_LOCK = threading.Lock()
+
+
+class FetchError(Exception):
+    """
+    Raised when an API request fails permanently or keeps failing after all retries
+    """
+
+
+def get_state_dir(*parts) -> str:
+    """
+    Returns (and creates) a directory for the add-on's local state files under
+    $SPLUNK_HOME/var/lib/splunk/modinputs/haringester_addon_for_splunk
+    """
+    path = make_splunkhome_path(
+        ["var", "lib", "splunk", "modinputs", ADDON_NAME, *parts]
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def safe_filename(name: str) -> str:
+    """
+    Turns an input name such as synthetics_browser_har_input://my_input into a file name
+    """
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def load_state(path: str):
+    """
+    Reads a JSON state file written by save_state, or returns None
+    """
     try:
-        cfm = conf_manager.ConfManager(
-            session_key,
-            ADDON_NAME,
-            realm=f"__REST_CREDENTIAL__#{ADDON_NAME}#configs/conf-haringester_addon_for_splunk_account",
-        )
-        account_conf_file = cfm.get_conf("haringester_addon_for_splunk_account")
-        return account_conf_file
-    except Exception:
-        logger.error(
-            f"Error occurred while reading haringester_addon_for_splunk_account.conf - {traceback.print_exc()}"
-        )
+        with open(path, encoding="utf-8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
         return None
 
 
-def make_session(header):
-    with requests.Session() as session:
-        session.headers = header
-        return session
+def save_state(path: str, state) -> None:
+    """
+    Replaces a JSON state file atomically, so readers never see a partial write.
+    Each writer uses its own temporary file, as several threads or processes may
+    save the same file at once; the last replace wins.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fp:
+            json.dump(state, fp)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
 
 
-def fetch_data(session: requests.Session, url, params, logger) -> dict:
-    try:
-        response = session.get(url, params=params)
-        # if response.status_code not in (200, 201):
-        #    return None
+def make_session(header, pool_maxsize: int = POOL_MAXSIZE, rate_limiter=None):
+    session = requests.Session()
+    session.headers.update(header)
+    # Every request made through the session first waits on the account's shared limiter
+    session.rate_limiter = rate_limiter
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-        response.raise_for_status()
 
-        return response.json()
+class SessionPool:
+    """
+    HTTP sessions shared per account by every stanza of a single-instance input
+    process, so stanzas reuse each other's pooled connections
+    """
+
+    def __init__(self) -> None:
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, account: str, header: dict, rate_limiter=None) -> requests.Session:
+        # A changed token gets a new session
+        key = (account, tuple(sorted(header.items())))
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = make_session(header, rate_limiter=rate_limiter)
+                self._sessions[key] = session
+            return session
+
+
+def retry_delay(response, attempt: int) -> float:
+    """
+    Seconds to wait before retrying: Retry-After or a rate-limit reset header when the
+    API provides one, otherwise exponential backoff with full jitter
+    """
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), BACKOFF_MAX)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    return min(max(wait, 0.0), BACKOFF_MAX)
+                except (TypeError, ValueError):
+                    pass
+        for header in RATE_LIMIT_RESET_HEADERS:
+            reset = response.headers.get(header)
+            if not reset:
+                continue
+            try:
+                reset = float(reset)
+            except ValueError:
+                continue
+            # Either an epoch timestamp or a number of seconds
+            wait = reset - time.time() if reset > 1e9 else reset
+            return min(max(wait, 0.0), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def request_with_retry(
+    session: requests.Session,
+    url,
+    params,
+    logger,
+    timeout=DEFAULT_TIMEOUT,
+    retries: int = MAX_RETRIES,
+    stream: bool = False,
+    metrics=None,
+) -> requests.Response:
+    """
+    GETs url, retrying throttled (429), unavailable (5xx) and timed out requests.
+    Returns the successful response; raises FetchError otherwise.
+    Every attempt is counted in metrics (a RunMetrics or TestMetrics), when given.
+    """
+    rate_limiter = getattr(session, "rate_limiter", None)
+    for attempt in range(retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        if metrics is not None:
+            metrics.add("http_calls")
+            if attempt:
+                metrics.add("http_retries")
+        response = None
+        try:
+            response = session.get(url, params=params, timeout=timeout, stream=stream)
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                delay = retry_delay(response, attempt)
+                logger.warning(
+                    f"HTTP {response.status_code} from {url}, retrying in {delay:.1f}s ({attempt + 1}/{retries})"
+                )
+                response.close()
+                time.sleep(delay)
+                continue
 
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP error occurred: {e}")
-        sys.exit()
+            response.raise_for_status()
+            return response
 
-    except Exception:
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"HTTP error occurred: {e}")
+            raise FetchError(str(e)) from e
+
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ) as e:
+            if attempt >= retries:
+                logger.error(
+                    f"Failure occurred while connecting to {url}.\nTraceback: {traceback.format_exc()}"
+                )
+                raise FetchError(str(e)) from e
+            delay = retry_delay(None, attempt)
+            logger.warning(
+                f"{type(e).__name__} from {url}, retrying in {delay:.1f}s ({attempt + 1}/{retries})"
+            )
+            time.sleep(delay)
+
+
+def fetch_data(
+    session: requests.Session, url, params, logger, timeout=DEFAULT_TIMEOUT, metrics=None
+) -> dict:
+    response = request_with_retry(
+        session, url, params, logger, timeout=timeout, metrics=metrics
+    )
+    if metrics is not None:
+        metrics.add("bytes_downloaded", len(response.content))
+    try:
+        return response.json()
+    except ValueError as e:
         logger.error(
-            f"Failure occurred while connecting to {url}.\nTraceback: {traceback.format_exc()}"
+            f"Failure occurred while decoding the response from {url}.\nTraceback: {traceback.format_exc()}"
         )
-        sys.exit()
-    return None
+        raise FetchError(str(e)) from e
 
 
-def write_events(data, config, logger, event_writer):
+def bounded_map(func, items, max_workers: int, return_exceptions: bool = False):
+    """
+    Runs func over items on a thread pool and yields (item, result) in input order.
+    At most 2 * max_workers results are in flight so a slow consumer bounds memory.
+    With return_exceptions, an exception raised by func is yielded as the item's
+    result instead of being raised.
+    """
+    window = max(1, max_workers) * 2
+    pending = deque()
+
+    def result(future):
+        if return_exceptions and future.exception() is not None:
+            return future.exception()
+        return future.result()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            if len(pending) >= window:
+                done_item, future = pending.popleft()
+                yield done_item, result(future)
+        while pending:
+            done_item, future = pending.popleft()
+            yield done_item, result(future)
+
+
+def fetch_to_file(
+    session: requests.Session, url, params, logger, timeout=DOWNLOAD_TIMEOUT, metrics=None
+):
+    """
+    Streams a response body into a spooled temporary file, rewound and ready to read.
+    Used for HAR artifacts, which are parsed incrementally instead of via response.json().
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        try:
+            with request_with_retry(
+                session, url, params, logger, timeout=timeout, stream=True, metrics=metrics
+            ) as response:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    spool.write(chunk)
+
+            if metrics is not None:
+                metrics.add("bytes_downloaded", spool.tell())
+            spool.seek(0)
+            return spool
+
+        except FetchError:
+            spool.close()
+            raise
+
+        except requests.exceptions.RequestException as e:
+            # The connection dropped mid-download: start the download over
+            spool.close()
+            if attempt >= MAX_RETRIES:
+                logger.error(
+                    f"Failure occurred while downloading {url}.\nTraceback: {traceback.format_exc()}"
+                )
+                raise FetchError(str(e)) from e
+            delay = retry_delay(None, attempt)
+            logger.warning(
+                f"Download of {url} interrupted, retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES})"
+            )
+            time.sleep(delay)
+
+
+# Characters ElementTree escapes in attribute values on top of &, < and >
+_ATTR_ENTITIES = {'"': "&quot;", "\r": "&#13;", "\n": "&#10;", "\t": "&#09;"}
+
+
+def _xml_text(value: str, entities=None) -> str:
+    """
+    Escapes value for XML as ElementTree does for smi.Event: markup characters are
+    escaped and non-ASCII characters become &#...; references
+    """
+    value = escape(value, entities) if entities else escape(value)
+    if value.isascii():
+        return value
+    return value.encode("ascii", "xmlcharrefreplace").decode("ascii")
+
+
+class EventBatcher:
+    """
+    Writes events to an EventWriter's output stream in buffered chunks, flushed by
+    event count or size, instead of building an smi.Event, rendering it through
+    ElementTree and flushing stdout once per event. The stanza attribute and the
+    index, source and sourcetype elements are constant for an input and rendered
+    once; the stanza tells splunkd which input an event belongs to when one
+    single-instance process writes for every input. The XML written is the
+    same as smi.Event produces, including non-ASCII text being written as character
+    references, so the stream stays pure ASCII whatever the encoding of stdout.
+    """
+
+    def __init__(
+        self,
+        event_writer,
+        index=None,
+        source=None,
+        sourcetype=None,
+        max_events: int = BATCH_MAX_EVENTS,
+        max_bytes: int = BATCH_MAX_BYTES,
+        stanza=None,
+    ) -> None:
+        self._event_writer = event_writer
+        self._start = (
+            '<event unbroken="1">'
+            if stanza is None
+            else f'<event stanza="{_xml_text(stanza, _ATTR_ENTITIES)}" unbroken="1">'
+        )
+        self._metadata = "".join(
+            f"<{tag}>{_xml_text(value)}</{tag}>"
+            for tag, value in (
+                ("source", source),
+                ("sourcetype", sourcetype),
+                ("index", index),
+            )
+            if value is not None
+        )
+        self._max_events = max_events
+        self._max_bytes = max_bytes
+        self._buffer = []
+        self._size = 0
+        # Time spent writing to the output stream, including waits on OUTPUT_LOCK
+        self.flush_seconds = 0.0
+
+    def add(self, data: str, time=None) -> None:
+        if time is None:
+            event = f"{self._start}{self._metadata}<data>{_xml_text(data)}</data><done /></event>"
+        else:
+            event = f"{self._start}<time>{time}</time>{self._metadata}<data>{_xml_text(data)}</data><done /></event>"
+        self._buffer.append(event)
+        self._size += len(event)
+        if len(self._buffer) >= self._max_events or self._size >= self._max_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        started = time.perf_counter()
+        out = self._event_writer._out
+        chunk = "".join(self._buffer)
+        with OUTPUT_LOCK:
+            if not self._event_writer.header_written:
+                chunk = "<stream>" + chunk
+                self._event_writer.header_written = True
+            out.write(chunk if isinstance(out, TextIOBase) else chunk.encode("utf-8"))
+            out.flush()
+        self._buffer = []
+        self._size = 0
+        self.flush_seconds += time.perf_counter() - started
+
+
+def write_events(
+    data, config, logger, event_writer, large_events=None, metrics=None
+) -> int:
+    """
+    Writes events from any iterable of HAR records, including lazy generators, and
+    returns the number of events written. Each record is serialized once; records
+    over the size limit are handled by the run's LargeEventPolicy.
+
+    With metrics, the time spent producing records (parsing and normalizing lazy
+    input), serializing them and writing them out is recorded as the parse,
+    serialize and write phases, with entries, events and bytes emitted.
+    """
+    if large_events is None:
+        large_events = LargeEventPolicy.from_config(config)
     sourcetype = config.get("sourcetype")
     index_name = config.get("index")
     input_name = config.get("input_name")
     source = config.get("platform")
-    if len(data) > 0:
-        for line in data:
-            if len(line) >= 10000:
-                testName = line["synthetics_detail"]["name"]
-                resource = line["request"]["url"]
-                logger.debug(
-                    f"Truncation will occur for {testName} and resource {resource}."
-                )
-            ts = line.get("startedDateTime")
-            event_writer.write_event(
-                smi.Event(
-                    data=json.dumps(line, ensure_ascii=False, default=str),
-                    index=index_name,
-                    source=source,
-                    sourcetype=sourcetype,
-                    time=ts,
-                )
-            )
+    batcher = EventBatcher(
+        event_writer, index_name, source, sourcetype, stanza=input_name
+    )
+    count = 0
+    entries = 0
+    emitted = 0
+    parse_seconds = serialize_seconds = 0.0
+    clock = time.perf_counter
+    records = iter(data)
+    while True:
+        started = clock()
+        line = next(records, None)
+        if line is None:
+            break
+        # Normalized HAR records are rendered into their event dict only now
+        if not isinstance(line, dict):
+            line = line.to_dict()
+        parsed = clock()
+        entries += 1
+        ts = line.get("startedDateTime")
+        payload = json.dumps(line, ensure_ascii=False, default=str)
+        size = payload_size(payload)
+        parse_seconds += parsed - started
+        serialize_seconds += clock() - parsed
+        if size > large_events.max_event_bytes:
+            for part in large_events.apply(line, payload, size, logger):
+                batcher.add(part, ts)
+                emitted += payload_size(part)
+                count += 1
+            continue
+        batcher.add(payload, ts)
+        emitted += size
+        count += 1
+    batcher.flush()
+
+    if metrics is not None:
+        metrics.add_time("parse", parse_seconds)
+        metrics.add_time("serialize", serialize_seconds)
+        metrics.add_time("write", batcher.flush_seconds)
+        metrics.add("entries_parsed", entries)
+        metrics.add("events_emitted", count)
+        metrics.add("bytes_emitted", emitted)
+
+    if count > 0:
         log.events_ingested(
             logger,
             input_name,
             sourcetype,
-            len(data),
+            count,
             index_name,
         )
 
     else:
         logger.warn("No data found.")
+    return count
@@ -23,6 +23,15 @@ fields = [
     field.RestField(
         "platform", required=True, encrypted=False, default=None, validator=None
     ),
+    field.RestField(
+        "requests_per_minute",
+        required=False,
+        encrypted=False,
+        default=None,
+        validator=validator.Pattern(
+            regex=r"""^\d*$""",
+        ),
+    ),
 ]
 model = RestModel(fields, name=None)
 
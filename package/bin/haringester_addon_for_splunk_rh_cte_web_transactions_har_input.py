@@ -41,6 +41,45 @@ fields = [
             min_len=1, 
         )
     ), 
+    field.RestField(
+        'large_event_policy',
+        required=False,
+        encrypted=False,
+        default='keep',
+        validator=None
+    ), 
+    field.RestField(
+        'max_event_bytes',
+        required=False,
+        encrypted=False,
+        default='10000',
+        validator=validator.Pattern(
+            regex=r"""^\d*$""", 
+        )
+    ), 
+    field.RestField(
+        'field_rules',
+        required=False,
+        encrypted=False,
+        default=None,
+        validator=validator.Pattern(
+            regex=r"""^(\s*(keep|drop|hash|truncate|redact):(?!(startedDateTime|transaction_details)(?![\w-]))[\w.-]+(:\d+)?\s*([,\n]|$))*$""", 
+        )
+    ), 
+    field.RestField(
+        'compact_headers',
+        required=False,
+        encrypted=False,
+        default=False,
+        validator=None
+    ), 
+    field.RestField(
+        'millisecond_timestamps',
+        required=False,
+        encrypted=False,
+        default=False,
+        validator=None
+    ), 
 
     field.RestField(
         'disabled',
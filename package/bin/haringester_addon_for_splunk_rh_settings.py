@@ -26,10 +26,23 @@ fields_logging = [
 model_logging = RestModel(fields_logging, name='logging')
 
 
+fields_advanced = [
+    field.RestField(
+        'single_instance',
+        required=False,
+        encrypted=False,
+        default=False,
+        validator=None
+    )
+]
+model_advanced = RestModel(fields_advanced, name='advanced')
+
+
 endpoint = MultipleModel(
     'haringester_addon_for_splunk_settings',
     models=[
-        model_logging
+        model_logging,
+        model_advanced
     ],
 )
 
@@ -1,7 +1,10 @@
 import logging
 import splunk.admin as admin
 from solnlib import log
-from har_utils import get_account_config, make_session, fetch_data
+from account_config import get_account_config
+from har_utils import make_session
+from rate_limiter import SYNTHETICS_REQUESTS_PER_MINUTE, make_rate_limiter
+from synthetics_inventory import SyntheticsInventory
 
 
 ADDON_NAME = "haringester_addon_for_splunk"
@@ -15,45 +18,57 @@ class SyntheticTests(admin.MConfigHandler):
 
     def setup(self):
         self.supportedArgs.addOptArg(self.param)
+        # Optional case-insensitive name filter and cap on the number of tests listed
+        self.supportedArgs.addOptArg("search")
+        self.supportedArgs.addOptArg("limit")
 
     def handleList(self, conf_info):
-        next_page = 1
         session_key = self.getSessionKey()
-        account_name = getattr(self.callerArgs, "data").get("account")[0]
+        data = getattr(self.callerArgs, "data")
+        account_name = data.get("account")[0]
+        search = (data.get("search") or [""])[0] or ""
+        try:
+            limit = int((data.get("limit") or [0])[0] or 0)
+        except ValueError:
+            limit = 0
         account_config = get_account_config(session_key, logger).get(account_name)
         access_token = account_config.get("access_token")
         o11y_realm = account_config.get("so_realm", 0)
         o11y_url = f"https://api.{o11y_realm}.signalfx.com"
-        checks_url = f"{o11y_url}/v2/synthetics/tests"
-        params = {"active": True, "testType": "browser", "page": next_page}
         header = {
             "Content-Type": "application/json",
             "X-SF-TOKEN": access_token,
         }
-        session = make_session(header)
-
-        while next_page > 0:
-            results = fetch_data(session, checks_url, params, logger)
-
-            if not results.get("tests"):
-                return None
-
-            if "tests" in results:
-                if not results.get("nextPageLink"):
-                    next_page = 0
-                else:
-                    next_page = results.get("nextPageLink")
-                # logger.debug(f"next page after api call is {next_page}")
-                for test in results.get("tests"):
-
-                    if not test["lastRunAt"]:
-                        logger.warning(f'No run history for {test["id"]}')
-                        continue
-                    test_name = test["name"]
-
-                    conf_info[test_name].append("name", test_name)
-            # for attr in dir(conf_info):
-            #    logger.debug(f"conf_info.{attr}={getattr(conf_info, attr)}")
+        session = make_session(
+            header,
+            rate_limiter=make_rate_limiter(
+                {
+                    "account": account_name,
+                    "requests_per_minute": account_config.get("requests_per_minute"),
+                },
+                SYNTHETICS_REQUESTS_PER_MINUTE,
+            ),
+        )
+
+        try:
+            tests = SyntheticsInventory(account_name, o11y_url).get(session, logger)
+        finally:
+            session.close()
+
+        search = search.lower()
+        listed = 0
+        for test in tests:
+            if not test["lastRunAt"]:
+                logger.warning(f'No run history for {test["id"]}')
+                continue
+            test_name = test["name"]
+            if search and search not in test_name.lower():
+                continue
+
+            conf_info[test_name].append("name", test_name)
+            listed += 1
+            if limit and listed >= limit:
+                break
 
 
 def main():
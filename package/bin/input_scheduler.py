@@ -0,0 +1,131 @@
+import configparser
+import os
+import signal
+import threading
+import time
+import traceback
+
+ADDON_NAME = "haringester_addon_for_splunk"
+SETTINGS_CONF = f"{ADDON_NAME}_settings.conf"
+# Mode an input's scheme was last registered with, kept in its checkpoint dir
+SCHEME_MODE_FILE = "single_instance"
+
+
+def single_instance_enabled() -> bool:
+    """
+    Reads [advanced] single_instance from the add-on's settings files on disk.
+
+    splunkd asks for the scheme before it hands out a session key, so the setting
+    can't be read over REST; it takes effect after Splunk is restarted.
+    """
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = configparser.ConfigParser(interpolation=None, strict=False)
+    try:
+        parser.read(
+            [
+                os.path.join(app_dir, "default", SETTINGS_CONF),
+                os.path.join(app_dir, "local", SETTINGS_CONF),
+            ]
+        )
+    except configparser.Error:
+        return False
+    value = parser.get("advanced", "single_instance", fallback="0")
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def scheme_single_instance(scheme_name: str) -> bool:
+    """
+    Returns the use_single_instance value to put in the scheme, and records it next
+    to the input's checkpoints as the mode splunkd registers the scheme with, for
+    runs_single_instance to read back.
+    """
+    enabled = single_instance_enabled()
+    splunk_home = os.environ.get("SPLUNK_HOME")
+    if splunk_home:
+        # The checkpoint_dir splunkd passes to the input's runs
+        path = os.path.join(
+            splunk_home, "var", "lib", "splunk", "modinputs", scheme_name
+        )
+        try:
+            os.makedirs(path, exist_ok=True)
+            mode_path = os.path.join(path, SCHEME_MODE_FILE)
+            with open(mode_path, "w", encoding="utf-8") as fp:
+                fp.write("1" if enabled else "0")
+        except OSError:
+            pass
+    return enabled
+
+
+def runs_single_instance(inputs) -> bool:
+    """
+    Whether splunkd started this process for every stanza of the input type, as
+    registered when it last read the scheme, rather than for a single stanza.
+
+    The settings file is not read here: a change to single_instance only takes
+    effect once splunkd has read the scheme again on restart, and until then the
+    process has to run the way splunkd launched it.
+    """
+    if len(inputs.inputs) > 1:
+        return True
+    path = os.path.join(inputs.metadata.get("checkpoint_dir") or "", SCHEME_MODE_FILE)
+    try:
+        with open(path, encoding="utf-8") as fp:
+            return fp.read().strip() == "1"
+    except OSError:
+        return False
+
+
+class InputScheduler:
+    """
+    Runs every stanza of a single-instance modular input on its own interval, each in
+    its own thread, inside one long-lived process. A run that overruns its interval
+    starts the next run immediately; runs of the same stanza never overlap.
+    """
+
+    def __init__(self, run_stanza, logger) -> None:
+        self._run_stanza = run_stanza
+        self._logger = logger
+        self._stop = threading.Event()
+
+    def stop(self, *args) -> None:
+        self._stop.set()
+
+    def run(self, inputs: dict) -> None:
+        """
+        Blocks until every stanza has finished (interval <= 0) or the process is asked
+        to stop
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+
+        threads = []
+        for input_name, input_item in inputs.items():
+            thread = threading.Thread(
+                target=self._loop,
+                args=(input_name, input_item),
+                name=input_name,
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+        while not self._stop.is_set() and any(t.is_alive() for t in threads):
+            self._stop.wait(1)
+
+    def _loop(self, input_name: str, input_item: dict) -> None:
+        try:
+            interval = float(input_item.get("interval") or 0)
+        except ValueError:
+            interval = 0
+
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self._run_stanza(input_name, input_item)
+            except (Exception, SystemExit):
+                self._logger.error(
+                    f"Run of {input_name} failed. Traceback: {traceback.format_exc()}"
+                )
+            if interval <= 0:
+                return
+            self._stop.wait(max(0.0, started + interval - time.monotonic()))
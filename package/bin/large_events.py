@@ -0,0 +1,158 @@
+import hashlib
+import json
+import uuid
+
+# Splunk's default TRUNCATE for a sourcetype
+MAX_EVENT_BYTES = 10000
+POLICIES = ("keep", "split", "hash", "drop", "truncate")
+# Per-event overhead reserved for the fields repeated in each split sub-event
+SPLIT_OVERHEAD_BYTES = 2048
+
+
+def payload_size(payload: str) -> int:
+    """
+    Size in bytes of a serialized event as Splunk counts it (UTF-8)
+    """
+    return len(payload) if payload.isascii() else len(payload.encode("utf-8"))
+
+
+def _cap_strings(value, limit: int):
+    """
+    Caps every string in a parsed JSON value at limit characters and returns the new value
+    """
+    if isinstance(value, str):
+        if len(value) > limit:
+            return f"{value[:limit]}...[truncated {len(value) - limit} chars]"
+        return value
+    if isinstance(value, dict):
+        for key, item in value.items():
+            value[key] = _cap_strings(item, limit)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            value[i] = _cap_strings(item, limit)
+    return value
+
+
+def _utf8_chunks(text: str, max_bytes: int) -> list:
+    """
+    Splits text into pieces of at most max_bytes UTF-8 bytes without breaking a character
+    """
+    data = text.encode("utf-8")
+    chunks = []
+    start = 0
+    while start < len(data):
+        end = min(start + max_bytes, len(data))
+        # Back off to the start of a character (continuation bytes are 0b10xxxxxx)
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        chunks.append(data[start:end].decode("utf-8"))
+        start = end
+    return chunks
+
+
+class LargeEventPolicy:
+    """
+    Decides what happens to events whose serialized size exceeds max_event_bytes,
+    which Splunk would otherwise truncate at index time:
+
+    keep      emit unchanged (Splunk truncates the event)
+    split     move response.content.text into linked sub-events
+    hash      replace response.content.text with its SHA-256 digest
+    drop      replace response.content.text with "REMOVED"
+    truncate  cap every string field so the event fits
+
+    One instance is used per polling run and accumulates the run's statistics.
+    """
+
+    def __init__(self, policy: str = "keep", max_event_bytes: int = MAX_EVENT_BYTES):
+        self.policy = policy if policy in POLICIES else "keep"
+        self.max_event_bytes = max_event_bytes
+        self.events_over_limit = 0
+        self.events_still_over_limit = 0
+        self.sub_events = 0
+        self.bytes_saved = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "LargeEventPolicy":
+        try:
+            max_event_bytes = int(config.get("max_event_bytes") or MAX_EVENT_BYTES)
+        except ValueError:
+            max_event_bytes = MAX_EVENT_BYTES
+        return cls(config.get("large_event_policy") or "keep", max_event_bytes)
+
+    def apply(self, record: dict, payload: str, size: int, logger) -> list:
+        """
+        Returns the serialized event(s) to write for a record over the size limit
+        """
+        self.events_over_limit += 1
+        payloads = [payload]
+
+        content = (record.get("response") or {}).get("content") or {}
+        body = content.get("text")
+        if self.policy in ("split", "hash", "drop") and isinstance(body, str):
+            if self.policy == "hash":
+                content["text"] = (
+                    f"sha256:{hashlib.sha256(body.encode('utf-8')).hexdigest()}"
+                )
+                payloads = [self._dumps(record)]
+            elif self.policy == "drop":
+                content["text"] = "REMOVED"
+                payloads = [self._dumps(record)]
+            else:
+                payloads = self._split(record, content, body)
+        elif self.policy == "truncate":
+            field_limit = max(256, self.max_event_bytes // 4)
+            payloads = [self._dumps(_cap_strings(record, field_limit))]
+
+        if self.policy != "split":
+            self.bytes_saved += size - payload_size(payloads[0])
+        if payload_size(payloads[0]) > self.max_event_bytes:
+            self.events_still_over_limit += 1
+            details = record.get("transaction_details") or {}
+            resource = (record.get("request") or {}).get("url")
+            logger.debug(
+                f"Truncation will occur for {details.get('name')} and resource {resource} "
+                f"({payload_size(payloads[0])} bytes, policy={self.policy})."
+            )
+        return payloads
+
+    def _split(self, record: dict, content: dict, body: str) -> list:
+        event_id = uuid.uuid4().hex
+        # Leave a quarter of the budget for JSON escaping of the chunk
+        budget = max(1024, self.max_event_bytes - SPLIT_OVERHEAD_BYTES) * 3 // 4
+        chunks = _utf8_chunks(body, budget)
+
+        content["text"] = ""
+        record["event_id"] = event_id
+        record["split_parts"] = len(chunks)
+        payloads = [self._dumps(record)]
+        for part, chunk in enumerate(chunks, start=1):
+            payloads.append(
+                self._dumps(
+                    {
+                        "parent_event_id": event_id,
+                        "part": part,
+                        "parts": len(chunks),
+                        "field": "response.content.text",
+                        "text": chunk,
+                        "startedDateTime": record.get("startedDateTime"),
+                        "transaction_details": record.get("transaction_details"),
+                    }
+                )
+            )
+        self.sub_events += len(chunks)
+        return payloads
+
+    @staticmethod
+    def _dumps(record: dict) -> str:
+        return json.dumps(record, ensure_ascii=False, default=str)
+
+    def log_summary(self, logger, input_name: str) -> None:
+        if not self.events_over_limit:
+            return
+        logger.info(
+            f"large_events input={input_name} policy={self.policy} "
+            f"max_event_bytes={self.max_event_bytes} events_over_limit={self.events_over_limit} "
+            f"still_over_limit={self.events_still_over_limit} sub_events={self.sub_events} "
+            f"bytes_saved={self.bytes_saved}"
+        )
@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from har_utils import get_state_dir, safe_filename
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Seconds of sustained traffic that may be sent as a burst after an idle period
+BURST_SECONDS = 5
+# Default request budgets per account, used when the account sets no requests_per_minute
+SYNTHETICS_REQUESTS_PER_MINUTE = 300
+# Just under ThousandEyes' 240 requests/minute org limit
+THOUSANDEYES_REQUESTS_PER_MINUTE = 220
+
+
+@contextmanager
+def _locked_file(path: str):
+    """
+    Opens path for read/write under an exclusive lock that is honoured by every
+    process on the host
+    """
+    with open(path, "a+b") as fp:
+        if fcntl is not None:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        else:
+            fp.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield fp
+        finally:
+            # Buffered writes must reach the file before another process can read it
+            fp.flush()
+            if fcntl is not None:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+            else:
+                fp.seek(0)
+                msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class AccountRateLimiter:
+    """
+    Token bucket keyed by account and shared by every input process on the host.
+
+    Inputs using the same account run in separate processes, so the bucket lives in a
+    small state file that is read and updated under a file lock. Each request takes a
+    token; when none is left the caller sleeps until the bucket has refilled, keeping
+    the combined request rate just under the vendor's per-org quota.
+    """
+
+    def __init__(self, account: str, requests_per_minute: float) -> None:
+        self.account = account
+        self.rate = float(requests_per_minute) / 60.0
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.path = os.path.join(
+            get_state_dir("rate_limits"), f"{safe_filename(account)}.json"
+        )
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Blocks until a request may be sent and returns the seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock, _locked_file(self.path) as fp:
+                now = time.time()
+                fp.seek(0)
+                try:
+                    state = json.loads(fp.read() or b"{}")
+                except ValueError:
+                    state = {}
+                tokens = state.get("tokens", self.capacity)
+                updated = state.get("updated", now)
+                tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+
+                if tokens >= 1:
+                    tokens -= 1
+                    wait = 0.0
+                else:
+                    wait = (1 - tokens) / self.rate
+
+                fp.seek(0)
+                fp.truncate()
+                fp.write(json.dumps({"tokens": tokens, "updated": now}).encode())
+
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+
+def make_rate_limiter(config: dict, default_requests_per_minute: int):
+    """
+    Builds the shared limiter for the input's account, or None when the input has no
+    account (e.g. when the clients are driven outside of Splunk)
+    """
+    account = config.get("account")
+    if not account:
+        return None
+    requests_per_minute = config.get("requests_per_minute")
+    try:
+        requests_per_minute = float(requests_per_minute)
+    except (TypeError, ValueError):
+        requests_per_minute = 0
+    if requests_per_minute <= 0:
+        requests_per_minute = default_requests_per_minute
+    return AccountRateLimiter(account, requests_per_minute)
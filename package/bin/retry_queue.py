@@ -0,0 +1,83 @@
+import os
+import time
+
+from har_utils import get_state_dir, load_state, safe_filename, save_state
+
+# Failed items are retried after BACKOFF_BASE * 2^(attempts - 1) seconds, capped at
+# BACKOFF_MAX, and given up on after MAX_ATTEMPTS
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 60
+BACKOFF_MAX = 6 * 60 * 60
+
+
+class RetryQueue:
+    """
+    Items (a test run, or a ThousandEyes round) that failed to ingest, persisted per
+    input so a failure only costs that item: the run carries on with the rest, and
+    the item is retried at the start of later runs once its backoff has elapsed.
+    """
+
+    def __init__(self, input_name: str, logger) -> None:
+        self._logger = logger
+        self.path = os.path.join(
+            get_state_dir("retry_queue"), f"{safe_filename(input_name)}.json"
+        )
+        self._entries = load_state(self.path) or {}
+        self._dirty = False
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def due(self, now: float = None) -> list:
+        """
+        Returns (key, item) for every entry whose backoff has elapsed, oldest first
+        """
+        now = time.time() if now is None else now
+        entries = sorted(self._entries.items(), key=lambda e: e[1]["next_attempt"])
+        return [
+            (key, entry["item"])
+            for key, entry in entries
+            if entry["next_attempt"] <= now
+        ]
+
+    def add(self, key: str, item: dict, error: str) -> bool:
+        """
+        Queues a failed item, or gives up on it after MAX_ATTEMPTS. Returns False when
+        given up on: the caller then moves its checkpoint past the item, as otherwise
+        the next run would find it again and start over at the first attempt.
+        """
+        attempts = self._entries.get(key, {}).get("attempts", 0) + 1
+        self._dirty = True
+        if attempts > MAX_ATTEMPTS:
+            self._logger.error(
+                f"Giving up on {key} after {MAX_ATTEMPTS} failed attempts: {error}"
+            )
+            self._entries.pop(key, None)
+            return False
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+        self._entries[key] = {
+            "item": item,
+            "attempts": attempts,
+            "next_attempt": time.time() + delay,
+            "error": error,
+        }
+        self._logger.warning(
+            f"Queued {key} for retry in {delay}s (attempt {attempts}): {error}"
+        )
+        return True
+
+    def remove(self, key: str) -> None:
+        if self._entries.pop(key, None) is not None:
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        if self._entries:
+            save_state(self.path, self._entries)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        self._dirty = False
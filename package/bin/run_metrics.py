@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from har_utils import EventBatcher, get_state_dir, safe_filename
+from large_events import MAX_EVENT_BYTES
+
+# Sourcetype of the one summary event written per polling run
+METRICS_SOURCETYPE = "haringester:run:metrics"
+# Most tests detailed in the summary, slowest first
+MAX_TESTS_IN_SUMMARY = 50
+# Size the summary is kept under by detailing fewer tests: a summary cut at the
+# default TRUNCATE would no longer be valid JSON
+MAX_SUMMARY_BYTES = MAX_EVENT_BYTES
+# Set to profile every run of the process, e.g. when driving the clients by hand
+PROFILE_ENV = "HARINGESTER_PROFILE"
+
+
+class _Stats:
+    __slots__ = ("seconds", "counts", "counters")
+
+    def __init__(self) -> None:
+        self.seconds = Counter()
+        self.counts = Counter()
+        self.counters = Counter()
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": {
+                name: {"seconds": round(seconds, 4), "count": self.counts[name]}
+                for name, seconds in self.seconds.items()
+            },
+            **self.counters,
+        }
+
+
+class RunMetrics:
+    """
+    Wall time, HTTP calls and data volumes of one polling run, by phase and by test,
+    written as a single summary event at the end of the run.
+
+    Phases are timed in the thread that runs them, so with worker pools the phase
+    seconds add up to more than the run's wall time. Only the slowest tests that fit
+    in MAX_SUMMARY_BYTES are detailed; tests_seen counts them all. Counters include http_calls,
+    http_retries, bytes_downloaded, entries_parsed, events_emitted and bytes_emitted.
+    """
+
+    def __init__(self, input_name: str = None) -> None:
+        self.input_name = input_name
+        self.started = time.time()
+        self._clock = time.perf_counter()
+        self._lock = threading.Lock()
+        self._run = _Stats()
+        self._tests = {}
+
+    def for_test(self, test) -> "TestMetrics":
+        return TestMetrics(self, str(test))
+
+    def add(self, counter: str, value: int = 1, test: str = None) -> None:
+        with self._lock:
+            self._run.counters[counter] += value
+            if test is not None:
+                self._tests.setdefault(test, _Stats()).counters[counter] += value
+
+    def add_time(self, phase: str, seconds: float, test: str = None) -> None:
+        with self._lock:
+            for stats in (self._run, self._tests.setdefault(test, _Stats()) if test else None):
+                if stats is not None:
+                    stats.seconds[phase] += seconds
+                    stats.counts[phase] += 1
+
+    @contextmanager
+    def phase(self, name: str, test: str = None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started, test)
+
+    def summary(self, status: str = "ok") -> dict:
+        with self._lock:
+            slowest = sorted(
+                self._tests.items(),
+                key=lambda item: sum(item[1].seconds.values()),
+                reverse=True,
+            )
+            summary = {
+                "input_name": self.input_name,
+                "status": status,
+                "started": round(self.started, 3),
+                "wall_seconds": round(time.perf_counter() - self._clock, 4),
+                **self._run.to_dict(),
+                "tests_seen": len(self._tests),
+                "tests": {},
+            }
+            size = len(json.dumps(summary))
+            for test, stats in slowest[:MAX_TESTS_IN_SUMMARY]:
+                detail = stats.to_dict()
+                # '"test": {...}, ' in the serialized summary
+                size += len(json.dumps(test)) + len(json.dumps(detail)) + 4
+                if size > MAX_SUMMARY_BYTES:
+                    break
+                summary["tests"][test] = detail
+            return summary
+
+    def write(self, event_writer, config: dict, logger, status: str = "ok") -> None:
+        summary = self.summary(status)
+        batcher = EventBatcher(
+            event_writer,
+            config.get("index"),
+            config.get("platform"),
+            METRICS_SOURCETYPE,
+            stanza=config.get("input_name"),
+        )
+        batcher.add(json.dumps(summary), round(time.time(), 3))
+        batcher.flush()
+        logger.info(
+            f"run_metrics input={self.input_name} status={status} "
+            f"wall_seconds={summary['wall_seconds']} "
+            f"http_calls={summary.get('http_calls', 0)} "
+            f"events_emitted={summary.get('events_emitted', 0)}"
+        )
+
+
+class TestMetrics:
+    """
+    View of a RunMetrics that also attributes everything recorded to one test
+    """
+
+    __slots__ = ("run", "test")
+
+    def __init__(self, run: RunMetrics, test: str) -> None:
+        self.run = run
+        self.test = test
+
+    def add(self, counter: str, value: int = 1) -> None:
+        self.run.add(counter, value, self.test)
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        self.run.add_time(phase, seconds, self.test)
+
+    def phase(self, name: str):
+        return self.run.phase(name, self.test)
+
+
+@contextmanager
+def profiled(input_name: str, logger):
+    """
+    Profiles the run inside the block with cProfile and tracemalloc when requested,
+    either for every run through the HARINGESTER_PROFILE environment variable or for
+    the next run of one input by creating <input>.request in the profile state dir.
+    The .prof file and the top allocations are written next to it.
+
+    cProfile only sees the thread running the block, so time spent in the test and
+    page worker pools shows up as waits on their futures. Only one run is profiled
+    at a time, since tracemalloc traces the whole process.
+    """
+    profile_dir = get_state_dir("profile")
+    name = safe_filename(input_name)
+    request_path = os.path.join(profile_dir, f"{name}.request")
+    if not os.environ.get(PROFILE_ENV) and not os.path.exists(request_path):
+        yield
+        return
+
+    import cProfile
+    import tracemalloc
+
+    if tracemalloc.is_tracing():
+        logger.info(f"Another run is being profiled, not profiling {input_name}")
+        yield
+        return
+    if os.path.exists(request_path):
+        os.remove(request_path)
+    prefix = os.path.join(profile_dir, f"{name}-{int(time.time())}")
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        profiler.dump_stats(f"{prefix}.prof")
+        with open(f"{prefix}.tracemalloc.txt", "w", encoding="utf-8") as fp:
+            fp.write(f"peak_bytes={peak}\n")
+            for stat in snapshot.statistics("lineno")[:50]:
+                fp.write(f"{stat}\n")
+        logger.info(f"Wrote profile of {input_name} to {prefix}.prof")
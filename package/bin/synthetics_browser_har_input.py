@@ -3,35 +3,20 @@ import logging
 import sys
 import traceback
 
-from synthetics_browser_tests import run_poll
-
 import import_declare_test
-from solnlib import conf_manager, log
-from solnlib.modular_input import KVStoreCheckpointer
+from input_scheduler import InputScheduler, runs_single_instance, scheme_single_instance
 from splunklib import modularinput as smi
-from splunklib import binding
+
+# solnlib, requests and the API clients are imported where they are first used, so
+# --scheme and validation invocations only pay for splunklib
 
 ADDON_NAME = "haringester_addon_for_splunk"
 
 
 def logger_for_input(input_name: str) -> logging.Logger:
-    return log.Logs().get_logger(f"{ADDON_NAME.lower()}_{input_name}")
+    from solnlib import log
 
-
-def get_account_config(session_key: str, logger):
-    try:
-        cfm = conf_manager.ConfManager(
-            session_key,
-            ADDON_NAME,
-            realm=f"__REST_CREDENTIAL__#{ADDON_NAME}#configs/conf-haringester_addon_for_splunk_account",
-        )
-        account_conf_file = cfm.get_conf("haringester_addon_for_splunk_account")
-        return account_conf_file
-    except Exception:
-        logger.error(
-            f"Error occurred while reading haringester_addon_for_splunk_account.conf - {traceback.print_exc()}"
-        )
-        return None
+    return log.Logs().get_logger(f"{ADDON_NAME.lower()}_{input_name}")
 
 
 class SYNTHETICS_BROWSER_HAR(smi.Script):
@@ -43,7 +28,9 @@ class SYNTHETICS_BROWSER_HAR(smi.Script):
         scheme.description = "synthetics_browser_har_input input"
         scheme.use_external_validation = True
         scheme.streaming_mode_xml = True
-        scheme.use_single_instance = False
+        scheme.use_single_instance = scheme_single_instance(
+            "synthetics_browser_har_input"
+        )
         scheme.add_argument(
             smi.Argument(
                 "name", title="Name", description="Name", required_on_create=True
@@ -76,6 +63,46 @@ class SYNTHETICS_BROWSER_HAR(smi.Script):
                 required_on_create=False,
             )
         )
+        scheme.add_argument(
+            smi.Argument(
+                "large_event_policy",
+                title="Large Event Handling",
+                description="Large Event Handling",
+                required_on_create=False,
+            )
+        )
+        scheme.add_argument(
+            smi.Argument(
+                "max_event_bytes",
+                title="Max Event Size (bytes)",
+                description="Max Event Size (bytes)",
+                required_on_create=False,
+            )
+        )
+        scheme.add_argument(
+            smi.Argument(
+                "field_rules",
+                title="Field Rules",
+                description="Field Rules",
+                required_on_create=False,
+            )
+        )
+        scheme.add_argument(
+            smi.Argument(
+                "compact_headers",
+                title="Compact Headers",
+                description="Compact Headers",
+                required_on_create=False,
+            )
+        )
+        scheme.add_argument(
+            smi.Argument(
+                "millisecond_timestamps",
+                title="Millisecond Timestamps",
+                description="Millisecond Timestamps",
+                required_on_create=False,
+            )
+        )
 
         return scheme
 
@@ -94,56 +121,93 @@ class SYNTHETICS_BROWSER_HAR(smi.Script):
         #     "python.version": "python3",
         #   },
         # }
-        input_items = [{"count": len(inputs.inputs)}]
+        session_key = inputs.metadata["session_key"]
+        if runs_single_instance(inputs):
+            from har_utils import SessionPool
+
+            # One process serves every stanza, each on its own interval, sharing
+            # HTTP sessions per account
+            sessions = SessionPool()
+            scheduler = InputScheduler(
+                lambda input_name, input_item: self.run_stanza(
+                    input_name, input_item, session_key, event_writer, sessions
+                ),
+                logger_for_input("scheduler"),
+            )
+            scheduler.run(inputs.inputs)
+            return
         for input_name, input_item in inputs.inputs.items():
-            normalized_input_name = input_name.split("/")[-1]
-            input_item["name"] = input_name
-            input_items.append(input_item)
-            logger = logger_for_input(normalized_input_name)
+            self.run_stanza(input_name, input_item, session_key, event_writer)
+
+    def run_stanza(
+        self, input_name, input_item, session_key, event_writer, sessions=None
+    ):
+        from account_config import get_account_config
+        from checkpoint_cache import CheckpointCache
+        from synthetics_browser_tests import run_poll
+        from solnlib import conf_manager, log
+        from solnlib.modular_input import KVStoreCheckpointer
+        from run_metrics import profiled
+
+        normalized_input_name = input_name.split("/")[-1]
+        input_item["name"] = input_name
+        logger = logger_for_input(normalized_input_name)
+        try:
+            log_level = conf_manager.get_log_level(
+                logger=logger,
+                session_key=session_key,
+                app_name=ADDON_NAME,
+                conf_name=f"{ADDON_NAME}_settings",
+            )
+            logger.setLevel(log_level)
+            log.modular_input_start(logger, normalized_input_name)
+            account_name = input_item.get("account")
+            account_config = get_account_config(session_key, logger).get(account_name)
+            access_token = account_config.get("access_token")
+            platform = account_config.get("platform")
+            o11y_realm = account_config.get("so_realm", 0)
+            o11y_url = f"https://api.{o11y_realm}.signalfx.com"
+            all_tests = input_item.get("all_test_toggle")
+            select_tests = ""
+            if all_tests == "0":
+                select_tests = input_item.get("synth_test").split(",")
+            config = {
+                "account": account_name,
+                "requests_per_minute": account_config.get("requests_per_minute"),
+                "platform": platform,
+                "o11y_url": o11y_url,
+                "realm": o11y_realm,
+                "access_token": access_token,
+                "select_tests": select_tests,
+                "org_id": input_item.get("org_id", ""),
+                "index": input_item.get("index"),
+                "large_event_policy": input_item.get("large_event_policy"),
+                "max_event_bytes": input_item.get("max_event_bytes"),
+                "field_rules": input_item.get("field_rules"),
+                "compact_headers": input_item.get("compact_headers"),
+                "millisecond_timestamps": input_item.get("millisecond_timestamps"),
+                "input_name": input_name,
+                "sourcetype": "splunk:synthetics:har",
+            }
+            checkpointer = CheckpointCache(
+                KVStoreCheckpointer(input_name, session_key, ADDON_NAME),
+                input_name,
+                logger,
+            )
             try:
-                session_key = inputs.metadata["session_key"]
-                log_level = conf_manager.get_log_level(
-                    logger=logger,
-                    session_key=session_key,
-                    app_name=ADDON_NAME,
-                    conf_name=f"{ADDON_NAME}_settings",
-                )
-                logger.setLevel(log_level)
-                log.modular_input_start(logger, normalized_input_name)
-                account_name = input_item.get("account")
-                account_config = get_account_config(session_key, logger).get(
-                    account_name
-                )
-                access_token = account_config.get("access_token")
-                platform = account_config.get("platform")
-                o11y_realm = account_config.get("so_realm", 0)
-                o11y_url = f"https://api.{o11y_realm}.signalfx.com"
-                all_tests = input_item.get("all_test_toggle")
-                select_tests = ""
-                if all_tests == "0":
-                    select_tests = input_item.get("synth_test").split(",")
-                config = {
-                    "platform": platform,
-                    "o11y_url": o11y_url,
-                    "realm": o11y_realm,
-                    "access_token": access_token,
-                    "select_tests": select_tests,
-                    "org_id": input_item.get("org_id", ""),
-                    "index": input_item.get("index"),
-                    "input_name": input_name,
-                    "sourcetype": "splunk:synthetics:har",
-                }
-                checkpointer = KVStoreCheckpointer(input_name, session_key, ADDON_NAME)
-                data = run_poll(checkpointer, config, logger, event_writer)
-
-                log.modular_input_end(logger, input_name)
-
-            except Exception as e:
-                logger.error(
-                    f"Exception raised while ingesting data for "
-                    f"har_ingester: {e}. Traceback: "
-                    f"{traceback.format_exc()}"
-                )
+                with profiled(input_name, logger):
+                    data = run_poll(checkpointer, config, logger, event_writer, sessions)
+            finally:
+                checkpointer.flush()
+
+            log.modular_input_end(logger, input_name)
+
+        except Exception as e:
+            logger.error(
+                f"Exception raised while ingesting data for "
+                f"har_ingester: {e}. Traceback: "
+                f"{traceback.format_exc()}"
+            )
 
 
 if __name__ == "__main__":
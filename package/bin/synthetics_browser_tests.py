@@ -1,11 +1,40 @@
-import requests, sys, time, traceback
-from datetime import datetime
-from har_utils import write_events, make_session, fetch_data
-
-EPOCH = datetime(1970, 1, 1)
-
-NOW_EPOCH = int(time.time())
-LAST_HALF_HOUR = int(NOW_EPOCH - 1800)
+import requests, time, traceback
+from typing import Iterator
+from har_utils import (
+    FetchError,
+    write_events,
+    make_session,
+    fetch_data,
+    fetch_to_file,
+    bounded_map,
+)
+from har_stream import iter_log_items
+from har_normalizer import HarNormalizer, SyntheticsAdapter
+from har_time import epoch_ms_to_iso, iso_to_epoch_ms
+from field_rules import FieldRules
+from large_events import LargeEventPolicy
+from rate_limiter import SYNTHETICS_REQUESTS_PER_MINUTE, make_rate_limiter
+from solnlib.utils import is_true
+from retry_queue import RetryQueue
+from run_metrics import RunMetrics
+from synthetics_inventory import (
+    INVENTORY_REFRESH,
+    SyntheticsInventory,
+    iter_browser_tests,
+    run_due,
+)
+
+# Number of tests whose artifacts and HAR files are fetched concurrently
+MAX_TEST_WORKERS = 8
+# Most runs ingested per test and location in one poll; older runs come first, so a
+# backlog is worked off over the following polls
+MAX_RUNS_PER_LOCATION = 20
+# How far back runs are caught up, in milliseconds, however old the checkpoint is
+CATCHUP_WINDOW_MS = 24 * 60 * 60 * 1000
+# Runs are listed in time windows expected to hold this many runs of a test
+RUNS_PER_WINDOW = 20
+# A runs answer this long may have been capped by the API, so its window is split
+RUNS_LIST_LIMIT = 100
 
 
 class SplunkSynthetics:
@@ -22,13 +51,145 @@ class SplunkSynthetics:
         self.o11y_url = config["o11y_url"]
         self.org_id = config["org_id"]
         self.realm = config["realm"]
+        self.account = config.get("account")
         self._logger = logger
+        self.metrics = RunMetrics(config.get("input_name"))
+        self.field_rules = FieldRules.compile(config.get("field_rules"))
+        self.compact_headers = is_true(config.get("compact_headers"))
+        self.millisecond_timestamps = is_true(config.get("millisecond_timestamps"))
         self.select_tests = config["select_tests"]
+        self.test_workers = max(1, int(config.get("test_workers", MAX_TEST_WORKERS)))
+        self.max_runs = max(
+            1, int(config.get("max_runs_per_location") or MAX_RUNS_PER_LOCATION)
+        )
         self._logger.debug(f"tests={self.select_tests}")
 
+    def fetch_test(self, session: requests.Session, test: dict) -> tuple:
+        """
+        Worker stage: finds the HAR artifact of a test's last run and downloads it.
+        Returns (har_url, har_file), or None when the run has no HAR artifact;
+        parsing is left to the writer stage.
+        """
+        har_url = self.get_artifacts(session, test)
+        if not har_url:
+            return None
+        metrics = self.metrics.for_test(test["test_id"])
+        return har_url, self.download_har(session, har_url, metrics)
+
+    def get_runs(
+        self,
+        session: requests.Session,
+        test_id: int,
+        location: str,
+        since: int,
+        until: int = None,
+    ) -> list:
+        """
+        Returns the epoch ms of a test's runs at a location after since and up to
+        until, oldest first, following the API's pagination
+        """
+        runs_url = f"{self.o11y_url}/v2/synthetics/tests/{test_id}/runs"
+        params = {"locationId": location, "startTime": epoch_ms_to_iso(since + 1)}
+        if until is not None:
+            params["endTime"] = epoch_ms_to_iso(until)
+        metrics = self.metrics.for_test(test_id)
+
+        run_times = set()
+        while True:
+            with metrics.phase("list_runs"):
+                response = fetch_data(
+                    session, runs_url, params, self._logger, metrics=metrics
+                )
+            for run in response.get("runs") or []:
+                if run.get("locationId", location) != location:
+                    continue
+                timestamp = run.get("timestamp")
+                if isinstance(timestamp, str):
+                    timestamp = iso_to_epoch_ms(timestamp)
+                if timestamp and timestamp > since and (until is None or timestamp <= until):
+                    run_times.add(int(timestamp))
+
+            next_page = response.get("nextPageLink")
+            if not next_page or not response.get("runs"):
+                break
+            if int(next_page) <= params.get("page", 1):
+                self._logger.warning(
+                    f"Pagination of {runs_url} did not advance past {next_page}"
+                )
+                break
+            params["page"] = int(next_page)
+        return sorted(run_times)
+
+    def list_runs_forward(
+        self, session: requests.Session, test: dict, location: str, since: int
+    ) -> list:
+        """
+        Lists the runs of a test at a location after since, oldest first, until
+        max_runs are found or the present is reached. Runs are asked for in time
+        windows of about RUNS_PER_WINDOW runs walking forward from since, so the
+        runs returned follow on from since without a gap however long the backlog.
+        A window answered with RUNS_LIST_LIMIT runs may have been cut short by the
+        API and is asked for again in halves.
+        """
+        period = max(1, int(test.get("frequency") or 1)) * 60 * 1000
+        window = period * RUNS_PER_WINDOW
+        now = int(time.time() * 1000)
+        run_times = []
+        start = since
+        while start < now and len(run_times) < self.max_runs:
+            end = min(start + window, now)
+            batch = self.get_runs(session, test["test_id"], location, start, end)
+            if len(batch) >= RUNS_LIST_LIMIT and end - start > period:
+                window = max(period, window // 2)
+                continue
+            run_times.extend(batch)
+            start = end
+            # Skip over a stretch without runs (e.g. a paused test) in fewer calls
+            window = period * RUNS_PER_WINDOW if batch else window * 2
+        return run_times
+
+    def plan_runs(
+        self, session: requests.Session, test: dict, location: str, checkpoint: int
+    ) -> list:
+        """
+        Worker stage: lists the runs of a test at a location that are newer than the
+        checkpoint, the oldest max_runs of them. Without a checkpoint only the latest
+        run is taken. If the runs can't be listed, the test's last run is used as before.
+        """
+        since = max(checkpoint, test["last_test_run"] - CATCHUP_WINDOW_MS)
+        try:
+            if checkpoint:
+                run_times = self.list_runs_forward(session, test, location, since)
+            else:
+                period = max(1, int(test.get("frequency") or 1)) * 60 * 1000
+                recent = max(since, test["last_test_run"] - 2 * period)
+                run_times = self.get_runs(session, test["test_id"], location, recent)
+        except FetchError:
+            self._logger.warning(
+                f"Could not list runs of test={test['test_id']} location={location}, "
+                f"falling back to its last run"
+            )
+            run_times = []
+
+        if not run_times and location == test["last_test_location"]:
+            run_times = [test["last_test_run"]]
+        if not checkpoint:
+            run_times = run_times[-1:]
+        elif len(run_times) > self.max_runs:
+            self._logger.info(
+                f"More than {self.max_runs} runs pending for test={test['test_id']} "
+                f"location={location}, ingesting the oldest {self.max_runs}"
+            )
+            run_times = run_times[: self.max_runs]
+
+        return [
+            dict(test, last_test_location=location, last_test_run=run_time)
+            for run_time in run_times
+        ]
+
     def get_artifacts(self, session: requests.Session, active_tests: dict) -> list:
         """
-        This function queries the Artifacts endpoint for the last run location for the runtime given
+        This function queries the Artifacts endpoint for the run location for the runtime given
         """
         test_id = active_tests.get("test_id")
         run_epoch = active_tests.get("last_test_run")
@@ -36,7 +197,11 @@ class SplunkSynthetics:
 
         artifact_url = f"{self.o11y_url}/v2/synthetics/tests/{test_id}/artifacts?locationId={last_test_location}&timestamp={run_epoch}"
 
-        artifacts = fetch_data(session, artifact_url, "", self._logger)
+        metrics = self.metrics.for_test(test_id)
+        with metrics.phase("get_artifacts"):
+            artifacts = fetch_data(
+                session, artifact_url, "", self._logger, metrics=metrics
+            )
 
         if not artifacts.get("artifacts"):
             self._logger.debug(f"No artifacts found for {test_id} and {run_epoch}.")
@@ -56,17 +221,47 @@ class SplunkSynthetics:
 
     def get_har(
         self, session: requests.Session, test_id: int, test_name: str, har_url: list
-    ) -> list:
+    ) -> Iterator:
         """
         This function fetches the HAR file from the url collected in the get_artifacts function
         """
+        har_file = self.download_har(session, har_url)
+        return self.parse_har(har_file, test_id, test_name, har_url)
+
+    def download_har(self, session: requests.Session, har_url: list, metrics=None):
+        """
+        Downloads the HAR artifact into a temporary file
+        """
         full_har_url = f"{self.o11y_url}{har_url[0]}"
 
-        har_data = fetch_data(session, full_har_url, "", self._logger)
+        metrics = metrics or self.metrics
+        with metrics.phase("download_har"):
+            har_file = fetch_to_file(
+                session, full_har_url, "", self._logger, metrics=metrics
+            )
 
-        if not har_data:
-            sys.exit()
+        if not har_file.read(1):
+            har_file.close()
+            raise FetchError(f"Empty HAR artifact at {full_har_url}")
+        har_file.seek(0)
+        return har_file
 
+    def parse_har(
+        self, har_file, test_id: int, test_name: str, har_url: list
+    ) -> Iterator:
+        """
+        Parses a downloaded HAR file one item at a time and yields the events lazily,
+        so neither the artifact nor the resulting events are ever held in memory at once.
+        The file is closed once the generator is exhausted or closed.
+        """
+        try:
+            yield from self._parse_har(har_file, test_id, test_name, har_url)
+        finally:
+            har_file.close()
+
+    def _parse_har(
+        self, har_file, test_id: int, test_name: str, har_url: list
+    ) -> Iterator:
         synthetics_detail_location = har_url[1]
         synthetics_detail_run_time = har_url[2]
         deep_link = f"https://app.{self.realm}.signalfx.com/#/synthetics/run/browser/{test_id}/{synthetics_detail_location}/{synthetics_detail_run_time}"
@@ -74,187 +269,236 @@ class SplunkSynthetics:
         if self.org_id:
             deep_link = f"{deep_link}?orgID={self.org_id}"
 
-        # The below code extracts required elements from the HAR file to store in a dict to ingest in to Splunk
-
-        # This extracts each page reference (i.e page 1 in the Synthetic check) and it's url
-        har_page_data = [
-            {
-                "page_ref": page["id"],
-                "page_url": page["title"],
-                "startedDateTime": synthetics_detail_run_time,
-                "web_vitals": page["_webVitals"],
-            }
-            for page in har_data["log"]["pages"]
-        ]
-
-        btransaction_data = []
-        if har_data["log"]["_groupData"]:
-            btransaction_data = [
-                {
-                    "pos": step["position"],
-                    "name": step["name"],
-                }
-                for step in har_data["log"]["_groupData"]
-            ]
-
-        har_data_arr = []
-        for page_data in har_page_data:
-            har_data_arr.append(page_data)
-        # The "entries" section in the HAR file is where each request is stored
-        for request in har_data["log"]["entries"]:
-            start_time = (
-                datetime.strptime(request["startedDateTime"], "%Y-%m-%dT%H:%M:%S.%fZ")
-                - EPOCH
-            )
-            start_time_epoch = int(start_time.total_seconds())
-
-            page_url = next(
-                (
-                    page["page_url"]
-                    for page in har_page_data
-                    if page["page_ref"] == request["pageref"]
-                ),
-                "",
-            )
-
-            business_transaction = ""
+        normalizer = HarNormalizer(
+            SyntheticsAdapter(
+                test_id,
+                test_name,
+                synthetics_detail_location,
+                synthetics_detail_run_time,
+                self.org_id,
+                self.realm,
+                deep_link,
+            ),
+            self.field_rules,
+            self.compact_headers,
+            self.millisecond_timestamps,
+        )
 
-            if "_btref" in request:
-                business_transaction = next(
-                    (
-                        bt["name"]
-                        for bt in btransaction_data
-                        if bt["pos"] == request["_btref"]
-                    ),
-                    "",
+        # First pass: each page reference (i.e page 1 in the Synthetic check) with its url,
+        # and the business transaction steps, indexed by the normalizer. Both are small and
+        # usually precede the entries, in which case the pass stops before reaching them.
+        har_pages = []
+        for section, item in iter_log_items(har_file, ("pages", "_groupData")):
+            if section == "pages":
+                har_pages.append(
+                    normalizer.add_page(item, synthetics_detail_run_time)
                 )
+            else:
+                normalizer.add_business_transaction(item)
 
-            if "postData" in request["request"]:
-                request["request"]["postData"] = "REMOVED"
-            # Splunk Synthetics adds additional job-related fields that don't appear to provide value.
-            # To keep it consistent, I'm adding standard components only.
-            har_data_dict = {
-                "business_transaction": business_transaction,
-                "page_url": page_url,
-                "pageref": request["pageref"],
-                "request": request["request"],
-                "response": request["response"],
-                "serverIPAddress": request.get("serverIPAddress", ""),
-                "startedDateTime": start_time_epoch,
-                "transaction_details": {
-                    "id": test_id,
-                    "name": test_name,
-                    "location": synthetics_detail_location,
-                    "org_id": self.org_id,
-                    "realm": self.realm,
-                    "run_time": synthetics_detail_run_time,
-                    "deep_link": deep_link,
-                },
-                "time": request["time"],
-                "timings": request["timings"],
-            }
-
-            har_data_arr.append(har_data_dict)
-        # Each dict holding each request is then put back in to a giant list and returned
-
-        return har_data_arr
+        yield from har_pages
+        # Second pass: the "entries" section in the HAR file is where each request is stored
+        har_file.seek(0)
+        for _, request in iter_log_items(har_file, ("entries",)):
+            yield normalizer.normalize(request)
 
     def get_active_checks(self, session: requests.Session) -> list:
         """
-        Returns all active Browser tests as dict objects in a list
+        Returns all active Browser tests as dict objects in a list.
+
+        The account's stored inventory is reused while it is younger than
+        INVENTORY_REFRESH and none of the selected tests is due to have run since,
+        so polls between runs make no API calls.
         """
-        test_list = []
-        next_page = 1
-        checks_url = f"{self.o11y_url}/v2/synthetics/tests"
-        params = {"active": True, "testType": "browser", "page": next_page}
-        self._logger.debug(f"next page at initial call is {next_page}")
-        while next_page > 0:
-            response = fetch_data(session, checks_url, params, self._logger)
-
-            if not response.get("tests"):
-                return None
-
-            if "tests" in response:
-                if not response.get("nextPageLink"):
-                    next_page = 0
-                else:
-                    next_page = response.get("nextPageLink")
-                self._logger.debug(f"next page after api call is {next_page}")
-                for test in response.get("tests"):
-
-                    if not test["lastRunAt"]:
-                        self._logger.warning(f'No run history for {test["id"]}')
-                        continue
-
-                    test_list.append(
-                        {
-                            "test_id": int(test["id"]),
-                            "test_name": test["name"],
-                            "last_test_run": round(
-                                (
-                                    datetime.strptime(
-                                        test["lastRunAt"], "%Y-%m-%dT%H:%M:%S.%fZ"
-                                    )
-                                    - EPOCH
-                                ).total_seconds()
-                                * 1000
-                            ),
-                            "last_test_location": test["lastRunLocationId"],
-                        }
+        inventory = None
+        tests = None
+        if self.account:
+            inventory = SyntheticsInventory(self.account, self.o11y_url)
+            tests = inventory.load(INVENTORY_REFRESH)
+        if tests is not None:
+            now = time.time()
+            due = [
+                test["name"]
+                for test in tests
+                if (not self.select_tests or test["name"] in self.select_tests)
+                and run_due(test, now)
+            ]
+            if due:
+                self._logger.debug(f"Tests due to have run again: {due}")
+                tests = None
+            else:
+                self._logger.debug("No test is due to have run, reusing the inventory")
+        if tests is None:
+            with self.metrics.phase("get_active_checks"):
+                tests = list(
+                    iter_browser_tests(
+                        session, self.o11y_url, self._logger, self.metrics
                     )
+                )
+            if inventory is not None:
+                # Also keeps the input editor's test list fresh
+                inventory.save(tests, self._logger)
+
+        test_list = []
+        for test in tests:
+            if not test["lastRunAt"]:
+                self._logger.warning(f'No run history for {test["id"]}')
+                continue
+
+            test_list.append(
+                {
+                    "test_id": int(test["id"]),
+                    "test_name": test["name"],
+                    "last_test_run": iso_to_epoch_ms(test["lastRunAt"]),
+                    "last_test_location": test["lastRunLocationId"],
+                    "frequency": test.get("frequency"),
+                    "locations": test.get("locationIds")
+                    or [test["lastRunLocationId"]],
+                }
+            )
 
         return test_list
 
 
-def run_poll(checkpointer, config, logger, event_writer):
+def run_key(test: dict) -> str:
+    return f'{test["test_id"]}_{test["last_test_location"]}_{test["last_test_run"]}'
+
+
+def run_poll(checkpointer, config, logger, event_writer, sessions=None):
     """
-    Main function that creates a Splunk Synthetics object
+    Main function that creates a Splunk Synthetics object. The run's timings and
+    volumes are written as one summary event once it ends, whether or not it failed.
     """
     client = SplunkSynthetics(config, logger)
-    session = make_session(client.header)
+    status = "error"
+    try:
+        _poll(client, checkpointer, config, logger, event_writer, sessions)
+        status = "ok"
+    finally:
+        client.metrics.write(event_writer, config, logger, status)
+
+
+def _poll(client, checkpointer, config, logger, event_writer, sessions):
+    rate_limiter = make_rate_limiter(config, SYNTHETICS_REQUESTS_PER_MINUTE)
+    if sessions is not None:
+        # Single-instance mode: the account's session outlives this run
+        session = sessions.get(config.get("account"), client.header, rate_limiter)
+    else:
+        session = make_session(client.header, rate_limiter=rate_limiter)
+    large_events = LargeEventPolicy.from_config(config)
     get_active = client.get_active_checks(session)
 
     select_tests_only = config.get("select_tests")
     if not get_active:
         logger.error("No active checks found.")
-        sys.exit()
+        if sessions is None:
+            session.close()
+        return
 
-    # For each active check, find available artifacts
+    # Every location of a test whose last run is newer than that location's
+    # checkpoint is caught up run by run
+    pending = []
     for test in get_active:
         test_name = test.get("test_name")
         test_id = test.get("test_id")
-        last_test_location = test.get("last_test_location")
         last_test_run = test.get("last_test_run")
 
         if select_tests_only and test_name not in select_tests_only:
             continue
 
-        checkpoint_name = f"{test_id}_{last_test_location}"
-        recent_checkpoint = checkpointer.get(checkpoint_name)
-        logger.debug(f"Checkpoint data: {recent_checkpoint}")
+        for location in test["locations"]:
+            checkpoint_name = f"{test_id}_{location}"
+            recent_checkpoint = checkpointer.get(checkpoint_name)
+            logger.debug(f"Checkpoint data: {recent_checkpoint}")
 
-        if recent_checkpoint is not None:
-            recent_checkpoint = recent_checkpoint.get("checkpoint")
-        else:
-            recent_checkpoint = 0
+            if recent_checkpoint is not None:
+                recent_checkpoint = recent_checkpoint.get("checkpoint")
+            else:
+                recent_checkpoint = 0
 
-        logger.debug(
-            f"synthetics_lastrun={last_test_location} recent_checkpoint={recent_checkpoint}"
-        )
-
-        if last_test_run > recent_checkpoint:
-            har_url = client.get_artifacts(session, test)
+            logger.debug(
+                f"synthetics_lastrun={last_test_run} location={location} recent_checkpoint={recent_checkpoint}"
+            )
 
-            # If the HAR artifact exists, get artifact and write it to Splunk
-            if har_url:
+            if last_test_run > recent_checkpoint:
+                pending.append((test, location, recent_checkpoint))
+            else:
+                logger.debug(
+                    f"Already written data for test={test_id} location={location} runtime={last_test_run}"
+                )
 
-                data = client.get_har(session, test_id, test_name, har_url)
+    retry_queue = None
+    due_tests = []
+    if config.get("input_name"):
+        # Runs that failed on earlier polls go first, once their backoff has elapsed
+        retry_queue = RetryQueue(config["input_name"], logger)
+        due_tests.extend(item for _, item in retry_queue.due())
+
+    for (test, location, _), runs in bounded_map(
+        lambda p: client.plan_runs(session, *p),
+        pending,
+        client.test_workers,
+        return_exceptions=True,
+    ):
+        if isinstance(runs, Exception):
+            logger.error(
+                f"Failed to list runs of test={test['test_id']} location={location}: {runs}"
+            )
+            continue
+        due_tests.extend(
+            run for run in runs if not (retry_queue and run_key(run) in retry_queue)
+        )
 
-                write_events(data, config, logger, event_writer)
+    # Workers fetch artifacts and HAR files concurrently, while this thread stays the
+    # single writer: events are written in run order and each checkpoint is only
+    # committed once that run's events have been written. A run that fails is queued
+    # for retry and the remaining runs carry on.
+    for test, fetched in bounded_map(
+        lambda t: client.fetch_test(session, t),
+        due_tests,
+        client.test_workers,
+        return_exceptions=True,
+    ):
+        key = run_key(test)
+        try:
+            if isinstance(fetched, Exception):
+                raise fetched
+            if fetched is None:
+                # The run has no HAR artifact, so there is nothing to write, but its
+                # checkpoint still moves on or the location's catch-up stalls on it
+                logger.info(f"No HAR artifact for {key}, skipping the run")
+            else:
+                har_url, har_file = fetched
+                data = client.parse_har(
+                    har_file, test["test_id"], test["test_name"], har_url
+                )
+                write_events(
+                    data,
+                    config,
+                    logger,
+                    event_writer,
+                    large_events,
+                    client.metrics.for_test(test["test_id"]),
+                )
+        except Exception as e:
+            logger.error(f"Failed to ingest {key}: {traceback.format_exc()}")
+            # A run given up on moves the checkpoint on as if it had been ingested
+            if retry_queue is None or retry_queue.add(
+                key, test, f"{type(e).__name__}: {e}"
+            ):
+                continue
 
-                checkpointer.update(checkpoint_name, {"checkpoint": last_test_run})
-        else:
-            logger.debug(
-                f"Already written data for test={test_id} location={last_test_location} runtime={last_test_run}"
+        if retry_queue is not None:
+            retry_queue.remove(key)
+        # A retried run may be older than runs ingested since it failed
+        checkpoint_name = f'{test["test_id"]}_{test["last_test_location"]}'
+        recent_checkpoint = checkpointer.get(checkpoint_name) or {}
+        if test["last_test_run"] > recent_checkpoint.get("checkpoint", 0):
+            checkpointer.update(
+                checkpoint_name, {"checkpoint": test["last_test_run"]}
             )
-    session.close()
+    if retry_queue is not None:
+        retry_queue.save()
+    large_events.log_summary(logger, config.get("input_name"))
+    if sessions is None:
+        session.close()
@@ -0,0 +1,123 @@
+import os
+import time
+
+from har_time import iso_to_epoch
+from har_utils import fetch_data, get_state_dir, load_state, safe_filename, save_state
+
+# Age in seconds after which the input editor re-lists the account's tests. Shorter
+# than INVENTORY_REFRESH so newly created tests show up in the editor within minutes,
+# at the cost of the editor walking the test list itself between quiet polls.
+INVENTORY_TTL = 300
+# Age in seconds after which a poll re-lists the tests even if none is due to run,
+# picking up new, changed and deleted tests
+INVENTORY_REFRESH = 900
+
+
+def iter_browser_tests(session, o11y_url: str, logger, metrics=None):
+    """
+    Yields every active Browser test of the org, following the API's pagination
+    """
+    checks_url = f"{o11y_url}/v2/synthetics/tests"
+    params = {"active": True, "testType": "browser", "page": 1}
+    while True:
+        response = fetch_data(session, checks_url, params, logger, metrics=metrics)
+        yield from response.get("tests") or []
+
+        next_page = response.get("nextPageLink")
+        logger.debug(f"next page after api call is {next_page}")
+        if not next_page or not response.get("tests"):
+            return
+        if int(next_page) <= params["page"]:
+            logger.warning(
+                f"Pagination of {checks_url} did not advance past {next_page}"
+            )
+            return
+        params["page"] = int(next_page)
+
+
+def run_due(test: dict, now: float) -> bool:
+    """
+    True when a test has probably run since it was listed: its last run plus its
+    frequency (minutes) has passed. Tests without run history or frequency count as due.
+    """
+    if not test.get("lastRunAt") or not test.get("frequency"):
+        return True
+    return iso_to_epoch(test["lastRunAt"]) + int(test["frequency"]) * 60 <= now
+
+
+class SyntheticsInventory:
+    """
+    On-disk list of an account's Browser tests, shared by the input editor's
+    get_tests endpoint and the Synthetics input.
+
+    A poll re-lists the tests and rewrites the file when one of its tests is due to
+    have run, and otherwise at least every INVENTORY_REFRESH seconds. The editor
+    reads the file while it is younger than INVENTORY_TTL. With frequently running
+    tests that is usually the case. When the input's tests run rarely, the file can
+    be older than the TTL, and the editor then lists the tests itself and saves
+    them for the polls to reuse.
+    """
+
+    FIELDS = (
+        "id",
+        "name",
+        "frequency",
+        "locationIds",
+        "lastRunAt",
+        "lastRunLocationId",
+    )
+
+    def __init__(self, account: str, o11y_url: str, ttl: int = INVENTORY_TTL) -> None:
+        self.o11y_url = o11y_url
+        self.ttl = ttl
+        self.path = os.path.join(
+            get_state_dir("inventory"), f"{safe_filename(account)}.json"
+        )
+
+    def load(self, max_age: float = None):
+        """
+        Returns the stored tests, or None when there are none for this realm or they
+        are older than max_age seconds
+        """
+        snapshot = load_state(self.path)
+        if snapshot is None or snapshot.get("o11y_url") != self.o11y_url:
+            return None
+        if max_age is not None and time.time() - snapshot.get("updated", 0) > max_age:
+            return None
+        return snapshot.get("tests")
+
+    def save(self, tests: list, logger) -> None:
+        """
+        Stores the tests. The inventory is only an optimization, so a failed write is
+        logged and the caller carries on with the tests it has.
+        """
+        snapshot = {
+            "o11y_url": self.o11y_url,
+            "updated": time.time(),
+            "tests": [
+                {field: test.get(field) for field in self.FIELDS} for test in tests
+            ],
+        }
+        try:
+            save_state(self.path, snapshot)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not save the test inventory to {self.path}: {e}")
+
+    def get(self, session, logger) -> list:
+        """
+        Returns the account's tests from disk while they are younger than the TTL, and
+        re-lists them otherwise. A stale list is served if the API can't be reached.
+        """
+        tests = self.load(self.ttl)
+        if tests is not None:
+            return tests
+        try:
+            tests = list(iter_browser_tests(session, self.o11y_url, logger))
+        except Exception:
+            tests = self.load()
+            if tests is None:
+                raise
+            logger.warning(f"Serving a stale test inventory from {self.path}")
+            return tests
+        self.save(tests, logger)
+        return tests
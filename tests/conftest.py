@@ -0,0 +1,106 @@
+import logging
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "package", "bin"), os.path.join(ROOT, "benchmarks")]
+
+from fakes import FakeEventWriter, FakeKVStoreCheckpointer, use_state_dir
+from mock_api import MockAPI, MockAPIServer
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path):
+    path = str(tmp_path / "state")
+    use_state_dir(path)
+    return path
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("tests")
+
+
+@pytest.fixture
+def mock_api():
+    """
+    Starts a mock API server with the given MockAPI options and no latency
+    """
+    servers = []
+
+    def start(**options):
+        server = MockAPIServer(MockAPI(**{"latency": 0.0, **options})).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def kv_store():
+    return FakeKVStoreCheckpointer()
+
+
+@pytest.fixture
+def poll(kv_store, logger):
+    """
+    Runs one polling run of a client's entry point (run_poll or
+    get_web_transactions) through a CheckpointCache, returning the event writer
+    """
+    from checkpoint_cache import CheckpointCache
+
+    def run(entry_point, config):
+        writer = FakeEventWriter()
+        checkpointer = CheckpointCache(kv_store, config["input_name"], logger)
+        try:
+            entry_point(checkpointer, config, logger, writer)
+        finally:
+            checkpointer.flush()
+        return writer
+
+    return run
+
+
+@pytest.fixture
+def synthetics_config():
+    """
+    Input config of a Synthetics input polling a mock API server
+    """
+
+    def config(server):
+        return {
+            "access_token": "test",
+            "o11y_url": server.url,
+            "org_id": "test",
+            "realm": "us1",
+            "select_tests": "",
+            "index": "main",
+            "input_name": "synthetics_browser_har_input://test",
+            "sourcetype": "splunk:synthetics:har",
+            "platform": "Splunk Synthetics",
+        }
+
+    return config
+
+
+@pytest.fixture
+def te_config():
+    """
+    Input config of a ThousandEyes input polling a mock API server
+    """
+
+    def config(server):
+        return {
+            "access_token": "test",
+            "api_endpoint": f"{server.url}/v7",
+            "index": "main",
+            "input_name": "cte_web_transactions_har_input://test",
+            "sourcetype": "cisco:thousandeyes:har",
+            "platform": "Cisco Thousand Eyes",
+        }
+
+    return config
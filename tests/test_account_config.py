@@ -0,0 +1,54 @@
+import account_config
+import pytest
+
+
+class FakeConfManager:
+    """
+    ConfManager returning the accounts readable with each session key
+    """
+
+    reads = []
+    accounts = {
+        "admin-session": {"prod": {"access_token": "secret"}},
+        "user-session": {},
+    }
+
+    def __init__(self, session_key, app, realm=None) -> None:
+        self.session_key = session_key
+
+    def get_conf(self, name):
+        return self
+
+    def get_all(self):
+        self.reads.append(self.session_key)
+        return self.accounts[self.session_key]
+
+
+@pytest.fixture(autouse=True)
+def conf_manager(monkeypatch):
+    FakeConfManager.reads = []
+    monkeypatch.setattr(account_config.conf_manager, "ConfManager", FakeConfManager)
+    account_config.invalidate()
+    yield FakeConfManager
+    account_config.invalidate()
+
+
+def test_accounts_are_cached_per_session(logger, conf_manager):
+    assert account_config.get_account_config("admin-session", logger) == {
+        "prod": {"access_token": "secret"}
+    }
+    assert account_config.get_account_config("admin-session", logger)
+    # Another caller never gets the tokens decrypted for the first one
+    assert account_config.get_account_config("user-session", logger) == {}
+    assert conf_manager.reads == ["admin-session", "user-session"]
+
+
+def test_expired_sessions_are_reloaded_and_dropped(monkeypatch, logger, conf_manager):
+    now = [1000.0]
+    monkeypatch.setattr(account_config.time, "monotonic", lambda: now[0])
+    account_config.get_account_config("admin-session", logger)
+    now[0] += account_config.CACHE_TTL
+    account_config.get_account_config("user-session", logger)
+    assert list(account_config._cache) == ["user-session"]
+    account_config.get_account_config("admin-session", logger)
+    assert conf_manager.reads == ["admin-session", "user-session", "admin-session"]
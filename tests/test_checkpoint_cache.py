@@ -0,0 +1,60 @@
+import os
+
+import checkpoint_cache
+from checkpoint_cache import CheckpointCache
+from fakes import FakeKVStoreCheckpointer
+
+INPUT = "synthetics_browser_har_input://test"
+
+
+def test_checkpoints_are_bulk_loaded(monkeypatch, kv_store, logger):
+    monkeypatch.setattr(checkpoint_cache, "QUERY_PAGE_SIZE", 10)
+    for i in range(25):
+        kv_store.update(f"{i}_loc", {"checkpoint": i})
+    kv_store.calls.clear()
+
+    cache = CheckpointCache(kv_store, INPUT, logger)
+    assert cache.get("7_loc") == {"checkpoint": 7}
+    assert cache.get("missing") is None
+    assert len(cache.items("1")) == 11
+    assert kv_store.calls == {"query": 3}
+
+
+def test_updates_are_batched(kv_store, logger):
+    cache = CheckpointCache(kv_store, INPUT, logger, flush_every=3)
+    for i in range(7):
+        cache.update(f"{i}_loc", {"checkpoint": i})
+    assert kv_store.calls["batch_update"] == 2
+    assert "6_loc" not in kv_store.states
+
+    cache.flush()
+    assert kv_store.calls["batch_update"] == 3
+    assert len(kv_store.states) == 7
+    assert "update" not in kv_store.calls
+
+
+def test_journal_is_replayed_after_a_crash(kv_store, logger):
+    cache = CheckpointCache(kv_store, INPUT, logger)
+    cache.update("1_loc", {"checkpoint": 1})
+    cache.update("1_loc", {"checkpoint": 2})
+    cache.update("2_loc", {"checkpoint": 3})
+    # The process dies before flushing, with a torn last journal line
+    cache._journal.write('{"_key": "3_lo')
+    cache._journal.close()
+    assert not kv_store.states
+
+    restarted = CheckpointCache(kv_store, INPUT, logger)
+    assert restarted.get("1_loc") == {"checkpoint": 2}
+    assert kv_store.get("2_loc") == {"checkpoint": 3}
+    assert kv_store.get("3_loc") is None
+    assert not os.path.exists(restarted._journal_path)
+
+
+def test_per_key_reads_without_a_collection(logger):
+    kv_store = FakeKVStoreCheckpointer()
+    kv_store.update("1_loc", {"checkpoint": 1})
+    del kv_store._collection_data
+
+    cache = CheckpointCache(kv_store, INPUT, logger)
+    assert cache.items() is None
+    assert cache.get("1_loc") == {"checkpoint": 1}
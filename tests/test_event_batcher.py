@@ -0,0 +1,81 @@
+import io
+import json
+
+from splunklib import modularinput as smi
+
+from har_utils import EventBatcher, write_events
+
+CONFIG = {
+    "sourcetype": "splunk:synthetics:har",
+    "index": "main",
+    "input_name": "synthetics_browser_har_input://test",
+    "platform": "Splunk Synthetics",
+}
+
+
+def smi_stream(events, config) -> str:
+    out = io.StringIO()
+    writer = smi.EventWriter(output=out)
+    for line in events:
+        writer.write_event(
+            smi.Event(
+                data=json.dumps(line, ensure_ascii=False, default=str),
+                index=config["index"],
+                source=config["platform"],
+                sourcetype=config["sourcetype"],
+                time=line.get("startedDateTime"),
+                stanza=config.get("input_name"),
+            )
+        )
+    return out.getvalue()
+
+
+def batched_stream(events, config, logger) -> str:
+    out = io.StringIO()
+    write_events(iter(events), config, logger, smi.EventWriter(output=out))
+    return out.getvalue()
+
+
+def test_events_name_their_input(logger):
+    events = [{"page_url": "https://example.com/", "startedDateTime": 1717236000.5}]
+    stream = batched_stream(events, CONFIG, logger)
+    assert stream == smi_stream(events, CONFIG)
+    assert '<event stanza="synthetics_browser_har_input://test" unbroken="1">' in stream
+
+
+def test_stanza_is_escaped_as_an_attribute():
+    stanza = 'cte_web_transactions_har_input://a "b" & <c>\tdé'
+    out = io.StringIO()
+    batcher = EventBatcher(smi.EventWriter(output=out), "main", stanza=stanza)
+    batcher.add("x", 1)
+    batcher.flush()
+
+    expected = io.StringIO()
+    smi.EventWriter(output=expected).write_event(
+        smi.Event(data="x", time=1, index="main", stanza=stanza)
+    )
+    assert out.getvalue() == expected.getvalue()
+
+
+def test_non_ascii_and_markup_match_smi_event(logger):
+    events = [
+        {
+            "page_url": "https://example.com/?a=1&b=<2>",
+            "title": 'Café "✓" 日本 \U0001f600 </data>',
+            "startedDateTime": 1717236000 + i,
+        }
+        for i in range(3)
+    ]
+    config = {**CONFIG, "platform": "Splunk Synthétics & <co>"}
+    stream = batched_stream(events, config, logger)
+    assert stream == smi_stream(events, config)
+    # Non-ASCII text is written as character references, like ElementTree does
+    assert stream.isascii()
+    assert "&#128512;" in stream and "&lt;/data&gt;" in stream
+
+
+def test_byte_streams_get_the_same_xml(logger):
+    events = [{"title": "é✓ & <b>", "startedDateTime": 1717236000}]
+    out = io.BytesIO()
+    write_events(iter(events), CONFIG, logger, smi.EventWriter(output=out))
+    assert out.getvalue().decode("ascii") == smi_stream(events, CONFIG)
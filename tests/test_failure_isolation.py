@@ -0,0 +1,140 @@
+import json
+import os
+
+import pytest
+
+import har_utils
+import retry_queue
+from cte_web_transactions import RoundSnapshot, get_web_transactions
+from retry_queue import RetryQueue
+from synthetics_browser_tests import run_poll
+
+
+@pytest.fixture(autouse=True)
+def immediate_retries(monkeypatch):
+    # Failed items are due again on the next poll, and errors aren't retried in-run
+    monkeypatch.setattr(retry_queue, "BACKOFF_BASE", 0)
+    monkeypatch.setattr(har_utils, "MAX_RETRIES", 0)
+
+
+def states(kv_store) -> dict:
+    return {key: json.loads(state) for key, state in kv_store.states.items()}
+
+
+def test_synthetics_failed_test_is_queued_and_retried(
+    mock_api, poll, kv_store, logger, synthetics_config
+):
+    server = mock_api(tests=4, locations=1, entries=2, pages=1)
+    api = server.api
+    config = synthetics_config(server)
+    api.fail(r"^/v2/synthetics/tests/2/artifacts$")
+
+    poll(run_poll, config)
+    assert sorted(kv_store.states) == ["1_aws-region-0", "3_aws-region-0", "4_aws-region-0"]
+    queue = RetryQueue(config["input_name"], logger)
+    assert [item["test_id"] for _, item in queue.due()] == [2]
+
+    api.failures.clear()
+    api.take_stats()
+    poll(run_poll, config)
+    # Only the queued run is fetched again
+    assert api.take_stats()["calls"]["synthetics_artifacts"] == 1
+    assert "2_aws-region-0" in kv_store.states
+    assert len(RetryQueue(config["input_name"], logger)) == 0
+    assert not os.path.exists(queue.path)
+
+
+def test_synthetics_failure_is_retried_until_given_up(
+    mock_api, poll, kv_store, logger, synthetics_config
+):
+    server = mock_api(tests=1, locations=1, entries=2, pages=1)
+    api = server.api
+    config = synthetics_config(server)
+    api.fail(r"/artifacts/har$")
+
+    for _ in range(retry_queue.MAX_ATTEMPTS + 1):
+        poll(run_poll, config)
+    assert len(RetryQueue(config["input_name"], logger)) == 0
+    # The run given up on is behind the checkpoint, so it isn't found again
+    (run,) = api.synthetics_runs(1, "aws-region-0", 0)[-1:]
+    assert states(kv_store) == {"1_aws-region-0": {"checkpoint": run}}
+
+    api.take_stats()
+    poll(run_poll, config)
+    assert "synthetics_artifacts" not in api.take_stats()["calls"]
+    assert len(RetryQueue(config["input_name"], logger)) == 0
+
+
+def te_round(kv_store) -> tuple:
+    state = states(kv_store)["1_1"]
+    return state.get("round"), state.get("page"), state["checkpoint"]
+
+
+def test_te_failed_round_resumes_at_its_failed_page(
+    mock_api, poll, kv_store, logger, te_config
+):
+    server = mock_api(tests=1, locations=2, entries=30, pages=3)
+    api = server.api
+    config = te_config(server)
+    api.fail(r"/agent/1/round/\d+/page/2$")
+
+    poll(get_web_transactions, config)
+    round_id, page, completed = te_round(kv_store)
+    assert (page, completed) == (2, 0)
+    assert states(kv_store)["1_2"]["checkpoint"]
+    (key, item), = RetryQueue(config["input_name"], logger).due()
+    assert key == f"1_1_{round_id}"
+    assert item["page"] == 2
+
+    api.failures.clear()
+    api.take_stats()
+    poll(get_web_transactions, config)
+    # The retry fetches the failed page only
+    assert api.take_stats()["calls"]["te_page"] == 1
+    assert te_round(kv_store) == (None, None, round_id)
+    assert len(RetryQueue(config["input_name"], logger)) == 0
+
+
+def test_te_interrupted_round_resumes_after_its_last_page(
+    mock_api, poll, kv_store, logger, te_config
+):
+    server = mock_api(tests=1, locations=1, entries=30, pages=3)
+    api = server.api
+    config = te_config(server)
+    api.fail(r"/page/2$")
+    poll(get_web_transactions, config)
+    round_id = te_round(kv_store)[0]
+
+    # A process killed mid-round saves neither its retry queue nor its snapshot,
+    # only the checkpoints of the pages it wrote
+    os.remove(RetryQueue(config["input_name"], logger).path)
+    os.remove(RoundSnapshot(config["input_name"]).path)
+
+    api.failures.clear()
+    api.take_stats()
+    poll(get_web_transactions, config)
+    calls = api.take_stats()["calls"]
+    assert calls["te_page"] == 1
+    assert te_round(kv_store) == (None, None, round_id)
+
+
+def test_te_failed_round_is_skipped_once_given_up(
+    mock_api, poll, kv_store, logger, te_config
+):
+    server = mock_api(tests=1, locations=1, entries=30, pages=3)
+    api = server.api
+    config = te_config(server)
+    api.fail(r"/page/2$")
+
+    for _ in range(retry_queue.MAX_ATTEMPTS + 1):
+        poll(get_web_transactions, config)
+    assert len(RetryQueue(config["input_name"], logger)) == 0
+    round_id = api.te_rounds(1, 0, api.now())[-1]
+    assert states(kv_store)["1_1"] == {"checkpoint": round_id}
+
+    # Even with the round still listed and no snapshot to skip the test on
+    os.remove(RoundSnapshot(config["input_name"]).path)
+    api.take_stats()
+    poll(get_web_transactions, config)
+    assert "te_page" not in api.take_stats()["calls"]
+    assert len(RetryQueue(config["input_name"], logger)) == 0
@@ -0,0 +1,63 @@
+import json
+import os
+import re
+
+import pytest
+
+from field_rules import FieldRules
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RH_FILES = (
+    "haringester_addon_for_splunk_rh_cte_web_transactions_har_input.py",
+    "haringester_addon_for_splunk_rh_synthetics_browser_har_input.py",
+)
+RULES = (
+    "",
+    "drop:request.cookies",
+    "keep:request.url, truncate:response.content.text:2000\nhash:request.headers.value",
+    "redact:startedDateTimeLocal",
+    "drop:transaction_details_extra.id",
+    "drop:transaction_details.id",
+    "hash:startedDateTime",
+    "keep:startedDateTime:10",
+    "drop:request cookies",
+    "delete:request.cookies",
+    "truncate:response.content.text:x",
+)
+
+
+def validator_patterns() -> list:
+    """
+    The field_rules patterns of the inputs' UI and REST handler validators
+    """
+    with open(os.path.join(ROOT, "globalConfig.json"), encoding="utf-8") as fp:
+        config = json.load(fp)
+    patterns = [
+        validator["pattern"]
+        for service in config["pages"]["inputs"]["services"]
+        for entity in service["entity"]
+        if entity["field"] == "field_rules"
+        for validator in entity["validators"]
+    ]
+    for name in RH_FILES:
+        with open(os.path.join(ROOT, "package", "bin", name), encoding="utf-8") as fp:
+            source = fp.read()
+        start = source.index("field_rules")
+        patterns.append(re.search(r'regex=r"""(.*?)"""', source[start:]).group(1))
+    return patterns
+
+
+def compiles(rules: str) -> bool:
+    try:
+        FieldRules.compile(rules)
+    except ValueError:
+        return False
+    return True
+
+
+@pytest.mark.parametrize("rules", RULES)
+def test_validators_accept_exactly_the_rules_that_compile(rules):
+    patterns = validator_patterns()
+    assert len(patterns) == 4
+    for pattern in patterns:
+        assert bool(re.match(pattern, rules)) == compiles(rules), pattern
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from cte_web_transactions import ThousandEyes
+from har_normalizer import HarNormalizer, ThousandEyesAdapter
+from synthetic_har import START_MS, te_round_pages
+
+STARTED = "2024-06-01T10:00:00.123Z"
+
+
+def entry() -> dict:
+    return {
+        "startedDateTime": STARTED,
+        "request": {"method": "GET", "url": "https://example.com/", "headers": []},
+        "response": {"status": 200, "headers": []},
+        "time": 12.5,
+        "timings": {"wait": 10},
+    }
+
+
+@pytest.mark.parametrize("millis, expected", [(False, 1717236000), (True, 1717236000.123)])
+def test_started_date_time_precision(millis, expected):
+    normalizer = HarNormalizer(
+        ThousandEyesAdapter(1, "test", "agent", 1717236000, "https://app"), millis=millis
+    )
+    started = normalizer.normalize(entry()).to_dict()["startedDateTime"]
+    assert started == expected
+    assert isinstance(started, type(expected))
+
+
+@pytest.mark.parametrize("setting, expected", [(None, int), ("0", int), ("1", float)])
+def test_input_setting_reaches_the_events(setting, expected):
+    config = {"access_token": "test", "api_endpoint": "https://api/v7"}
+    if setting is not None:
+        config["millisecond_timestamps"] = setting
+    client = ThousandEyes(config, None)
+    page = json.loads(te_round_pages(3)[0])
+    entries = list(client._page_entries(1, START_MS // 1000, page))
+    assert {type(e.to_dict()["startedDateTime"]) for e in entries} == {expected}
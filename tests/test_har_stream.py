@@ -0,0 +1,65 @@
+import io
+import json
+
+import pytest
+
+import har_stream
+from har_stream import iter_log_items
+from synthetic_har import write_synthetics_har
+
+SECTIONS = ("pages", "_groupData", "entries")
+
+
+def read(document: bytes, sections=SECTIONS) -> list:
+    return list(iter_log_items(io.BytesIO(document), sections))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64 * 1024])
+def test_items_match_json_loads(monkeypatch, chunk_size):
+    monkeypatch.setattr(har_stream, "CHUNK_SIZE", chunk_size)
+    har = io.BytesIO()
+    write_synthetics_har(har, 40, pages=3, transactions=2)
+    document = json.loads(har.getvalue())["log"]
+
+    expected = [
+        (section, item) for section in SECTIONS for item in document[section]
+    ]
+    assert read(har.getvalue()) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+def test_strings_numbers_and_other_members(monkeypatch, chunk_size):
+    monkeypatch.setattr(har_stream, "CHUNK_SIZE", chunk_size)
+    entries = [
+        {"url": 'https://x/é✓ "quoted" \\ \n', "size": 12345678901234},
+        {"time": -1.5e-3, "ok": True, "cache": None, "nested": [[], {}, [1, [2]]]},
+    ]
+    document = {
+        "head": [{"entries": ["not these"]}],
+        "log": {"version": "1.2", "creator": {"entries": []}, "entries": entries},
+        "tail": 12345,
+    }
+    for ensure_ascii in (True, False):
+        text = json.dumps(document, ensure_ascii=ensure_ascii, indent=1).encode("utf-8")
+        assert read(text, ("entries",)) == [("entries", entry) for entry in entries]
+
+
+def test_missing_and_empty_sections():
+    assert read(b"") == []
+    assert read(b'{"log": {"pages": [], "entries": null}}') == []
+    assert read(b'{"log": {"entries": [1, 2]}, "other": {}}') == [
+        ("entries", 1),
+        ("entries", 2),
+    ]
+
+
+def test_stops_once_every_section_is_read():
+    # Nothing after the requested sections is parsed, not even invalid JSON
+    assert read(b'{"log": {"pages": [{"id": 1}], "rest": [', ("pages",)) == [
+        ("pages", {"id": 1})
+    ]
+
+
+def test_invalid_json_raises():
+    with pytest.raises(ValueError):
+        read(b'{"log": {"entries": [1 2]}}')
@@ -0,0 +1,39 @@
+import os
+from types import SimpleNamespace
+
+import input_scheduler
+from input_scheduler import runs_single_instance, scheme_single_instance
+
+SCHEME = "synthetics_browser_har_input"
+
+
+def input_definition(splunk_home, stanzas: int):
+    return SimpleNamespace(
+        inputs={f"{SCHEME}://input_{i}": {"interval": "300"} for i in range(stanzas)},
+        metadata={
+            "session_key": "key",
+            "checkpoint_dir": os.path.join(
+                str(splunk_home), "var", "lib", "splunk", "modinputs", SCHEME
+            ),
+        },
+    )
+
+
+def test_mode_is_the_one_the_scheme_was_registered_with(monkeypatch, tmp_path):
+    monkeypatch.setenv("SPLUNK_HOME", str(tmp_path))
+    monkeypatch.setattr(input_scheduler, "single_instance_enabled", lambda: True)
+    assert scheme_single_instance(SCHEME)
+    assert runs_single_instance(input_definition(tmp_path, 1))
+
+    # Turning the setting off doesn't change how the running splunkd launches inputs
+    monkeypatch.setattr(input_scheduler, "single_instance_enabled", lambda: False)
+    assert runs_single_instance(input_definition(tmp_path, 1))
+    # until it reads the scheme again
+    assert not scheme_single_instance(SCHEME)
+    assert not runs_single_instance(input_definition(tmp_path, 1))
+
+
+def test_several_stanzas_mean_single_instance(monkeypatch, tmp_path):
+    monkeypatch.setattr(input_scheduler, "single_instance_enabled", lambda: False)
+    assert runs_single_instance(input_definition(tmp_path, 3))
+    assert not runs_single_instance(input_definition(tmp_path, 1))
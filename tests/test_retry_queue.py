@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+import retry_queue
+from retry_queue import BACKOFF_BASE, MAX_ATTEMPTS, RetryQueue
+
+INPUT = "synthetics_browser_har_input://test"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(retry_queue.time, "time", lambda: now[0])
+    return now
+
+
+def test_backoff_doubles_up_to_its_cap(monkeypatch, logger, clock):
+    monkeypatch.setattr(retry_queue, "BACKOFF_MAX", 5 * BACKOFF_BASE)
+    queue = RetryQueue(INPUT, logger)
+    delays = []
+    for _ in range(MAX_ATTEMPTS):
+        queue.add("run", {"test_id": 1}, "boom")
+        delays.append(queue._entries["run"]["next_attempt"] - clock[0])
+    assert delays[:4] == [BACKOFF_BASE, 2 * BACKOFF_BASE, 4 * BACKOFF_BASE, 5 * BACKOFF_BASE]
+    assert max(delays) == 5 * BACKOFF_BASE
+
+
+def test_gives_up_after_max_attempts(logger, clock):
+    queue = RetryQueue(INPUT, logger)
+    for _ in range(MAX_ATTEMPTS):
+        assert queue.add("run", {"test_id": 1}, "boom")
+    assert "run" in queue
+    assert not queue.add("run", {"test_id": 1}, "boom")
+    assert "run" not in queue
+
+
+def test_due_items_oldest_first(logger, clock):
+    queue = RetryQueue(INPUT, logger)
+    queue.add("a", {"n": 1}, "boom")
+    queue.add("a", {"n": 1}, "boom")
+    queue.add("b", {"n": 2}, "boom")
+    assert queue.due() == []
+    assert queue.due(clock[0] + BACKOFF_BASE) == [("b", {"n": 2})]
+    assert queue.due(clock[0] + 2 * BACKOFF_BASE) == [("b", {"n": 2}), ("a", {"n": 1})]
+
+
+def test_saved_until_empty(logger, clock):
+    queue = RetryQueue(INPUT, logger)
+    queue.add("run", {"test_id": 1}, "boom")
+    queue.save()
+    assert os.path.exists(queue.path)
+
+    reloaded = RetryQueue(INPUT, logger)
+    assert "run" in reloaded and len(reloaded) == 1
+    reloaded.remove("run")
+    reloaded.save()
+    assert not os.path.exists(queue.path)
@@ -0,0 +1,45 @@
+import json
+from xml.sax.saxutils import unescape
+
+from fakes import FakeEventWriter
+from run_metrics import MAX_SUMMARY_BYTES, METRICS_SOURCETYPE, RunMetrics
+
+PHASES = ("fetch_artifacts", "download_har", "parse", "normalize", "serialize", "write")
+COUNTERS = ("http_calls", "bytes_downloaded", "entries_parsed", "events_emitted")
+
+
+def run_with_tests(tests: int) -> RunMetrics:
+    metrics = RunMetrics("synthetics_browser_har_input://test")
+    for test_id in range(1, tests + 1):
+        test = metrics.for_test(f"browser-test-{test_id:06d}")
+        for phase in PHASES:
+            test.add_time(phase, test_id * 0.012345)
+        for counter in COUNTERS:
+            test.add(counter, test_id * 1234567)
+    return metrics
+
+
+def written_summary(metrics: RunMetrics, logger) -> str:
+    writer = FakeEventWriter(capture=METRICS_SOURCETYPE)
+    metrics.write(writer, {"index": "main", "platform": "Splunk Synthetics"}, logger)
+    (chunk,) = writer._out.captured
+    start = chunk.index("<data>") + len("<data>")
+    return unescape(chunk[start : chunk.index("</data>", start)])
+
+
+def test_summary_of_a_large_run_stays_under_truncate(logger):
+    data = written_summary(run_with_tests(200), logger)
+    assert len(data.encode("utf-8")) <= MAX_SUMMARY_BYTES
+    summary = json.loads(data)
+    assert summary["tests_seen"] == 200
+    # The slowest tests are the ones detailed
+    detailed = sorted(summary["tests"])
+    assert 0 < len(detailed) < 50
+    assert detailed[-1] == "browser-test-000200"
+    assert detailed[0] == f"browser-test-{201 - len(detailed):06d}"
+    assert summary["events_emitted"] == sum(range(1, 201)) * 1234567
+
+
+def test_summary_of_a_small_run_details_every_test(logger):
+    summary = json.loads(written_summary(run_with_tests(5), logger))
+    assert sorted(summary["tests"]) == [f"browser-test-{i:06d}" for i in range(1, 6)]
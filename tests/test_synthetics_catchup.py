@@ -0,0 +1,76 @@
+import json
+
+from synthetics_browser_tests import run_poll
+
+PERIOD_MS = 60 * 1000
+
+
+def checkpoint(kv_store):
+    return json.loads(kv_store.states["1_aws-region-0"])["checkpoint"]
+
+
+def test_outage_backlog_is_caught_up_without_gaps(
+    mock_api, poll, kv_store, synthetics_config
+):
+    # A 1-minute test, polled once, then not for 3 hours
+    server = mock_api(tests=1, locations=1, frequency=1, entries=2, pages=1)
+    api = server.api
+    api.advance(-3 * 60 * 60)
+    config = synthetics_config(server)
+
+    poll(run_poll, config)
+    assert api.take_stats()["calls"]["synthetics_artifacts"] == 1
+    first = checkpoint(kv_store)
+
+    api.advance(3 * 60 * 60)
+    ingested = 0
+    previous = first
+    for _ in range(10):
+        poll(run_poll, config)
+        runs = api.take_stats()["calls"].get("synthetics_artifacts", 0)
+        # Each poll takes the oldest runs pending, and its checkpoint only covers them
+        assert checkpoint(kv_store) == previous + runs * PERIOD_MS
+        assert runs <= 20
+        ingested += runs
+        previous = checkpoint(kv_store)
+
+    assert ingested == 180
+    assert previous == first + 180 * PERIOD_MS
+
+
+def test_steady_state_lists_runs_once_per_location(mock_api, poll, synthetics_config):
+    server = mock_api(tests=2, locations=2, frequency=5, entries=2, pages=1)
+    # The API clock never runs ahead of the client's
+    server.api.advance(-5 * 60)
+    config = synthetics_config(server)
+    poll(run_poll, config)
+    server.api.take_stats()
+
+    server.api.advance(5 * 60)
+    poll(run_poll, config)
+    calls = server.api.take_stats()["calls"]
+    assert calls["synthetics_runs"] == 4
+    assert calls["synthetics_artifacts"] == 4
+
+
+def test_runs_without_har_do_not_stall_catch_up(mock_api, poll, kv_store, synthetics_config):
+    server = mock_api(tests=1, locations=1, frequency=1, entries=2, pages=1)
+    api = server.api
+    api.advance(-170 * 60)
+    config = synthetics_config(server)
+    poll(run_poll, config)
+    first = checkpoint(kv_store)
+
+    # A full poll's worth of runs without a HAR artifact, then 150 runs with one
+    api.without_har = {
+        (1, "aws-region-0", first + i * PERIOD_MS) for i in range(1, 21)
+    }
+    api.advance(170 * 60)
+    api.take_stats()
+    for _ in range(10):
+        poll(run_poll, config)
+
+    calls = api.take_stats()["calls"]
+    assert calls["synthetics_artifacts"] == 170
+    assert calls["synthetics_har"] == 150
+    assert checkpoint(kv_store) == first + 170 * PERIOD_MS